@@ -6,8 +6,12 @@ from collections.abc import Sequence
 
 class BaseController(ABC):
     name = 'base_controller'
-    def __init__(self, vehicles, sim_time: int, sample_time: float, space: BaseSpace):
+    records = ()  # names of the (n_vehicles, recorded steps) arrays filled by the controller
+    def __init__(self, vehicles, sim_time: int, sample_time: float, space: BaseSpace, control_time: float = None):
         self.sample_time = sample_time
+        # control period, a multiple of the integration period; u_control is held in between
+        self.control_every = max(1, round(control_time / sample_time)) if control_time else 1
+        self.control_time = self.control_every * sample_time
         self.sim_time = sim_time
         self.N = round(sim_time / sample_time) + 1
         self.simTime = np.arange(start=0, stop=self.sample_time*self.N, step=sample_time)#[:, None]
@@ -16,9 +20,82 @@ class BaseController(ABC):
         self.vehicles = vehicles
         self.colors = {vehicle.serial_number: vehicle.color for vehicle in vehicles}
         self.data_storage = None
+        # every record_every-th step is recorded, into memory-mapped files if store_raw
+        self.record_every = 1
+        self.record_time = sample_time
+        self.store_raw = False
+        self.allocate_records()
 
-    def generate_control(self, positions, step) -> Sequence:
+    def generate_control(self, positions, step, velocities=None) -> Sequence:
+        """
+        Control inputs of the vehicles at the given positions (eta); the loop also
+        passes their measured velocities (nu).
+        """
         pass
 
+    def hold_control(self, step) -> None:
+        """
+        Called instead of generate_control() on the steps between two control ticks.
+        """
+        self.record(step)
+
+    def set_recording(self, record_every=1, store_raw=False) -> None:
+        """
+        Keeps every record_every-th step of the recorded arrays. With store_raw they
+        are memory-mapped .npy files in the DataStorage folder instead of RAM arrays.
+        """
+        self.record_every = max(1, int(record_every))
+        self.record_time = self.record_every * self.sample_time
+        self.store_raw = store_raw
+        self.simTime = np.arange(self.recorded_columns(self.N)) * self.record_time
+        self.allocate_records()
+
+    def allocate_records(self) -> None:
+        shape = (self.number_of_vehicles, self.recorded_columns(self.N))
+        for name in self.records:
+            setattr(self, name, self.data_storage.open_array(name, shape) if self.store_raw else np.zeros(shape))
+        # values of the last control tick, recorded on every recorded step until the next tick
+        self.last = {name: np.zeros(self.number_of_vehicles) for name in self.records}
+
+    def record_column(self, step):
+        """
+        Returns the column of the recorded arrays that holds step, None if the step is skipped.
+        """
+        return None if step % self.record_every else step // self.record_every
+
+    def recorded_columns(self, steps) -> int:
+        return (steps + self.record_every - 1) // self.record_every
+
+    def record(self, step) -> None:
+        column = self.record_column(step)
+        if column is not None:
+            for name in self.records:
+                getattr(self, name)[:, column] = self.last[name]
+
+    def get_state(self, step) -> dict:
+        """
+        Returns the arrays needed to continue the run from simulation step `step`.
+        """
+        columns = self.recorded_columns(step)
+        state = {name: getattr(self, name)[:, :columns] for name in self.records}
+        state.update({f"last/{name}": value for name, value in self.last.items()})
+        return state
+
+    def set_state(self, state, step) -> None:
+        columns = self.recorded_columns(step)
+        for name in self.records:
+            getattr(self, name)[:, :columns] = state[name]
+            self.last[name][:] = state[f"last/{name}"]
+
+    def truncate(self, steps) -> None:
+        """
+        Shortens the run to the first steps samples, e.g. after an early stop.
+        """
+        self.N = steps
+        columns = self.recorded_columns(steps)
+        self.simTime = self.simTime[:columns]
+        for name in self.records:
+            setattr(self, name, getattr(self, name)[:, :columns])
+
     def set_data_storage(self, data_storage) -> None:
-        self.data_storage = data_storage
\ No newline at end of file
+        self.data_storage = data_storage
@@ -0,0 +1,81 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from spaces import BaseSpace
+from .BaseController import BaseController
+
+
+class HeadingController(BaseController):
+    """
+    Heading autopilot of a swarm: the PID controller with the 3rd-order
+    reference model of the vehicle (Otter.headingAutopilotBatch) steers every
+    vessel to its reference heading, one batched call per control tick. The yaw
+    rate is the measured one, nu[5] of every vessel.
+    """
+    name = 'heading'
+    records = ('heading', 'psi_d', 'r_d')
+    def __init__(self, vehicles, sim_time: int, sample_time: float, space: BaseSpace, FPS=30, isolines=10,
+                 psi_ref=None, tau_X=None, control_time: float = None):
+        super().__init__(vehicles, sim_time, sample_time, space, control_time)
+        autopilot = vehicles[0]
+        if not hasattr(autopilot, 'headingAutopilotBatch') or any(type(v) is not type(autopilot) for v in vehicles):
+            raise ValueError(f"The heading controller needs vehicles of one type with a heading autopilot, "
+                             f"got {sorted({v.name for v in vehicles})}")
+        self.autopilot = autopilot
+        # reference heading (deg) and surge force (N), one per vessel
+        self.psi_ref = np.radians(np.broadcast_to([v.ref for v in vehicles] if psi_ref is None else psi_ref,
+                                                  self.number_of_vehicles)).astype(float)
+        self.tau_X = np.broadcast_to([v.tauX for v in vehicles] if tau_X is None else tau_X,
+                                     self.number_of_vehicles).astype(float)
+        # columns e_int, psi_d, r_d, a_d
+        self.state = np.zeros((self.number_of_vehicles, 4))
+        self.FPS = FPS
+        self.isolines = isolines
+        self.type = 'Heading autopilot'
+
+    def __str__(self):
+        return (f'---controller--------------------------------------------------------------------------\n'
+                f'{self.type}\n'
+                f'Sampling frequency: {round(1 / self.sample_time)} Hz\n'
+                f'Sampling time: {self.sample_time} seconds\n'
+                f'Control frequency: {round(1 / self.control_time, 2)} Hz\n'
+                f'Simulation time: {round(self.sim_time)} seconds\n'
+                f'Numbers of vehicles: {self.number_of_vehicles}')
+
+    def generate_control(self, positions, step, velocities=None):
+        if velocities is None:
+            raise ValueError("The heading controller needs the measured velocities of the vehicles")
+        eta = np.asarray(positions, float)
+        nu = np.asarray(velocities, float)
+        psi = eta[:, 5]
+        controls = self.autopilot.headingAutopilotBatch(eta, nu, self.state, self.control_time,
+                                                        psi_ref=self.psi_ref, tau_X=self.tau_X)
+        self.last['heading'][:] = psi
+        self.last['psi_d'][:] = self.state[:, 1]
+        self.last['r_d'][:] = self.state[:, 2]
+        self.record(step)
+        return controls
+
+    def get_state(self, step) -> dict:
+        state = super().get_state(step)
+        state["autopilot"] = self.state.copy()
+        return state
+
+    def set_state(self, state, step) -> None:
+        super().set_state(state, step)
+        self.state[:] = state["autopilot"]
+
+    def plotting_heading(self, store_plot=False, **arguments):
+        plt.figure()
+        plt.xlabel('Time,s', fontsize=12)
+        plt.ylabel('Heading, deg', fontsize=12)
+        for i in range(self.number_of_vehicles):
+            color = self.colors.get(i)
+            plt.plot(self.simTime, np.degrees(self.heading[i]), label=f'Agent {i + 1}', color=color)
+            plt.plot(self.simTime, np.degrees(self.psi_d[i]), linestyle='--', color=color)
+        plt.legend()
+        if store_plot:
+            plt.savefig(self.data_storage.get_path('heading', 'png'))
+            plt.close()
+        else:
+            plt.title('Heading and desired heading (dashed)', fontsize=10)
+            plt.show()
@@ -1,6 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
+import math
 from math import pi
 from tqdm import tqdm
 from matplotlib import rc, rcParams, rcParamsDefault
@@ -13,6 +14,7 @@ from numpy.ma.core import cumsum
 from .BaseController import BaseController
 from tools.random_generators import normalize
 from tools.random_generators import color_generator
+from tools.backend import jit, use_jit
 
 legendSize = 16
 legendSize1 = 10
@@ -27,21 +29,31 @@ def R2D(value):  # radians to degrees
 def cm2inch(value):  # inch to cm
     return value / 2.54
 
+@jit
+def berman_law_kernel(f_current, f_prev, control_time, mu, f0):
+    """
+    [der,mu_tanh,sigma] = berman_law_kernel(f_current,f_prev,control_time,mu,f0)
+    is the switching law of berman_law() for the 'numba' backend.
+    """
+    der = (f_current - f_prev) / control_time
+    mu_tanh = mu * math.tanh(f_current - f0)
+    s = der + mu_tanh
+    sigma = -1.0 if s > 0 else (1.0 if s < 0 else 0.0)
+    return der, mu_tanh, sigma
+
 
 class IntensityBasedController(BaseController):
     name = 'intensity'
-    def __init__(self, vehicles, sim_time: int, sample_time: float, space: BaseSpace, FPS=30, isolines=10, f0=0, mu=0.5):
-        super().__init__(vehicles, sim_time, sample_time, space)
-        self.m_f_prev = [space.get_intensity(vehicle.starting_point[1], vehicle.starting_point[0]) for vehicle in vehicles]
+    records = ('intensity', 'der', 'mu_tanh', 'sigmas', 'quality_array')
+    def __init__(self, vehicles, sim_time: int, sample_time: float, space: BaseSpace, FPS=30, isolines=10, f0=0, mu=0.5,
+                 control_time: float = None):
+        super().__init__(vehicles, sim_time, sample_time, space, control_time)
+        starting_points = np.array([vehicle.starting_point for vehicle in vehicles], float)
+        self.m_f_prev = space.get_intensity(starting_points[:, 1], starting_points[:, 0])
         self.f0 = f0
         self.mu = mu
         self.FPS = FPS
         self.isolines = isolines
-        self.intensity = np.zeros((self.number_of_vehicles, self.N), dtype=float)
-        self.der = np.zeros((self.number_of_vehicles, self.N), dtype=float)
-        self.mu_tanh = np.zeros((self.number_of_vehicles, self.N), dtype=float)
-        self.sigmas = np.zeros((self.number_of_vehicles, self.N), dtype=float)
-        self.quality_array = np.zeros((self.number_of_vehicles, self.N), dtype=float)
         self.type = 'Individual intensity based controller'
 
     def __str__(self):
@@ -49,18 +61,27 @@ class IntensityBasedController(BaseController):
                 f'{self.type}\n'
                 f'Sampling frequency: {round(1 / self.sample_time)} Hz\n'
                 f'Sampling time: {self.sample_time} seconds\n'
+                f'Control frequency: {round(1 / self.control_time, 2)} Hz\n'
+                f'Berman law: mu = {self.mu}, f0 = {self.f0}\n'
                 f'Simulation time: {round(self.sim_time)} seconds\n'
                 f'Numbers of vehicles: {self.number_of_vehicles}')
 
     def berman_law(self, vehicle, step, f_current, f_prev):
-        self.der[vehicle, step] = (f_current - f_prev) / self.sample_time
-        self.mu_tanh[vehicle, step] = self.mu * np.tanh(f_current - self.f0)
-        self.sigmas[vehicle, step] = -np.sign(self.der[vehicle, step] + self.mu_tanh[vehicle, step])
-        return self.sigmas[vehicle, step]
-
-    def generate_control(self, positions, step):
-        m_f_current = [self.space.get_intensity(eta[1], eta[0]) for eta in positions]
-        # self.quality_array.append([self.space.get_nearest_contour_point_norm(eta[0], eta[1]) for eta in positions])
+        if use_jit():
+            last = self.last
+            last['der'][vehicle], last['mu_tanh'][vehicle], last['sigmas'][vehicle] = berman_law_kernel(
+                f_current, f_prev, self.control_time, self.mu, self.f0)
+            return last['sigmas'][vehicle]
+        self.last['der'][vehicle] = (f_current - f_prev) / self.control_time
+        self.last['mu_tanh'][vehicle] = self.mu * np.tanh(f_current - self.f0)
+        self.last['sigmas'][vehicle] = -np.sign(self.last['der'][vehicle] + self.last['mu_tanh'][vehicle])
+        return self.last['sigmas'][vehicle]
+
+    def generate_control(self, positions, step, velocities=None):
+        positions = np.asarray(positions, float)
+        # one batched query for all vehicles
+        m_f_current = self.space.get_intensity(positions[:, 1], positions[:, 0])
+        quality = self.space.get_nearest_contour_point_norm_batch(positions[:, 1], positions[:, 0])
         controls = []
         for vehicle in self.vehicles:
             f_current = m_f_current[vehicle.serial_number]
@@ -76,12 +97,22 @@ class IntensityBasedController(BaseController):
                 u_control = [0, 0]
             controls.append(u_control)
             #print(u_control)
-            self.intensity[vehicle.serial_number, step] = f_current
-            self.quality_array[vehicle.serial_number, step] = self.space.get_nearest_contour_point_norm(positions[vehicle.serial_number][0], positions[vehicle.serial_number][1])
+            self.last['intensity'][vehicle.serial_number] = f_current
+            self.last['quality_array'][vehicle.serial_number] = quality[vehicle.serial_number]
 
         self.m_f_prev = m_f_current
+        self.record(step)
         return controls
 
+    def get_state(self, step) -> dict:
+        state = super().get_state(step)
+        state["m_f_prev"] = np.array(self.m_f_prev, float)
+        return state
+
+    def set_state(self, state, step) -> None:
+        super().set_state(state, step)
+        self.m_f_prev = np.array(state["m_f_prev"], float)
+
     def plotting_sigma(self, store_plot=False, **arguments):
         # print(np.array(self.der).shape)
         # print(np.array(self.mu_tanh).shape)
@@ -105,7 +136,7 @@ class IntensityBasedController(BaseController):
                 plt.show()
 
     def plotting_сumulative(self, store_plot=False, **arguments):
-        cumulative_quality = cumsum(self.sample_time*self.quality_array, axis=1)
+        cumulative_quality = cumsum(self.record_time*self.quality_array, axis=1)
 
         plt.figure()
         plt.xlabel('Time,s', fontsize=12)
@@ -221,10 +252,12 @@ class IntensityBasedController(BaseController):
             x = simData[:, 0]
             y = simData[:, 1]
             z = simData[:, 2]
-            # down-sampling the xyz data points
-            N = y[::len(x) // self.space.grid_size];
-            E = x[::len(x) // self.space.grid_size];
-            D = z[::len(x) // self.space.grid_size];
+            # down-sampling the xyz data points, a track recorded with record_every > 1
+            # may have fewer rows than the grid
+            step = max(1, len(x) // self.space.grid_size)
+            N = y[::step]
+            E = x[::step]
+            D = z[::step]
 
             dataSet = np.array([N, E, -D])  # Down is negative z
             # Highlight the first point with an asterisk
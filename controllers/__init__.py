@@ -1,6 +1,7 @@
 from .BaseController import *
 from .SwarmController import *
 from .IntensityBasedController import *
+from .HeadingController import *
 
 controller_instance = {}
 
@@ -16,4 +17,5 @@ def create_instance(class_name: str, **arguments) -> BaseController:
         raise ValueError(f"Unknown class name: {class_name}")
 
 register_class(SwarmController)
-register_class(IntensityBasedController)
\ No newline at end of file
+register_class(IntensityBasedController)
+register_class(HeadingController)
\ No newline at end of file
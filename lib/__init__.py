@@ -2,5 +2,14 @@
 # -*- coding: utf-8 -*-
 
 from .gnc import *
+from .control import *
+from .integrators import *
+from .swarmEngine import *
+from .currentField import *
+from .recorder import *
+from .profiler import *
+from .stopConditions import *
+from .checkpoint import *
 from .simultaneousLoop import *
+from .vectorEnv import *
 from .plotTimeSeries import *
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+backendParity.py:
+    Parity checks of the 'numba' backend (tools/backend.py) against the NumPy
+    code of the models.
+
+    kernel_parity()   every kernel against the code it replaces on random inputs,
+                      runs without numba too, the kernels are then plain Python
+    backend_parity()  the same scenario simulated with both backends
+
+    The module imports the vehicle models, so it is not re-exported by lib and is
+    imported as lib.backendParity.
+"""
+import math
+import numpy as np
+import tools.backend as backend
+from vehicles import Otter, Dubins
+from vehicles.otter import otter_nu_dot_kernel
+from vehicles.dubins import dubins_velocity_kernel
+from controllers.IntensityBasedController import berman_law_kernel
+from .gnc import attitudeEuler, attitudeEulerKernel, crossFlowForces, crossFlowKernel, crossFlowStrips
+from .simultaneousLoop import simultaneous_simulate
+
+
+def _relative_error(value, reference) -> float:
+    value, reference = np.asarray(value, float), np.asarray(reference, float)
+    return float(np.max(np.abs(value - reference) / (1 + np.abs(reference))))
+
+
+def kernel_parity(spaces=(), samples=1000, seed=0) -> dict:
+    """
+    Returns the largest relative difference between every kernel and the NumPy
+    code it replaces on random states, the intensity kernels are checked on the
+    given spaces.
+    """
+    rng = np.random.default_rng(seed)
+    selected = backend.active_backend
+    backend.active_backend = 'numpy'
+    try:
+        eta = np.column_stack((rng.uniform(-50, 50, (samples, 3)), rng.uniform(-1.5, 1.5, (samples, 3))))
+        nu = rng.uniform(-3, 3, (samples, 6))
+        errors = {}
+
+        errors['attitudeEuler'] = max(_relative_error(attitudeEulerKernel(eta[i].copy(), nu[i], 0.02),
+                                                      attitudeEuler(eta[i].copy(), nu[i], 0.02))
+                                      for i in range(samples))
+
+        otter = Otter()
+        params = otter.params
+        k, x0, dx, S = crossFlowStrips(params.L, params.B_pont, params.T)
+        errors['crossFlowDrag'] = max(_relative_error(crossFlowKernel(k, x0, dx, S, v_r, r),
+                                                      crossFlowForces(params.L, params.B_pont, params.T, v_r, r))
+                                      for v_r, r in nu[:, [1, 5]].tolist())
+
+        u_actual = rng.uniform(1.2 * otter.n_min, 1.2 * otter.n_max, (samples, 2))
+        current = np.column_stack((rng.uniform(0, 1, samples), rng.uniform(-math.pi, math.pi, samples)))
+        errors['otter'] = _relative_error(
+            otter_nu_dot_kernel(eta, nu, u_actual, current, params.kernel_constants, params.rg, params.rp, params.Ig,
+                                params.MA_sym, params.D, params.G, params.Minv, params.S_crossflow),
+            otter.nu_dot_batch(eta, nu, u_actual, current))
+
+        dubins = Dubins()
+        u_control = rng.uniform(dubins.n_min, dubins.n_max, (samples, 2))
+        errors['dubins'] = _relative_error(dubins_velocity_kernel(eta, u_control, dubins.R, dubins.B),
+                                           dubins.velocity_batch(eta, u_control))
+
+        f_current, f_prev = rng.uniform(-20, 20, (2, samples))
+        der = (f_current - f_prev) / 0.02
+        mu_tanh = 0.5 * np.tanh(f_current)
+        errors['berman_law'] = _relative_error(
+            [berman_law_kernel(f, f_p, 0.02, 0.5, 0.0) for f, f_p in zip(f_current, f_prev)],
+            np.column_stack((der, mu_tanh, -np.sign(der + mu_tanh))))
+
+        for space in spaces:
+            x = rng.uniform(space.x[0], space.x[-1], samples)
+            y = rng.uniform(space.y[0], space.y[-1], samples)
+            errors[f'{space.name}_intensity'] = _relative_error(
+                [space.intensity_kernel(x_i, y_i, space.peak_array, space.shift_xyz.shift_x(),
+                                        space.shift_xyz.shift_y()) - space.target_isoline for x_i, y_i in zip(x, y)],
+                [space.analytic_intensity(x_i, y_i) for x_i, y_i in zip(x, y)])
+    finally:
+        backend.active_backend = selected
+    return errors
+
+
+def backend_parity(make_controller, **simulate_arguments) -> float:
+    """
+    Simulates the controllers built by make_controller() with the 'numpy' and the
+    'numba' backend and returns the largest difference of the recorded tables.
+    """
+    if backend.numba is None:
+        raise RuntimeError("numba is not installed, there is no second backend to compare")
+    selected = backend.active_backend
+    try:
+        tables = []
+        for name in backend.backends:
+            backend.set_backend(name)
+            tables.append(simultaneous_simulate(make_controller(), **simulate_arguments))
+    finally:
+        backend.active_backend = selected
+    return float(np.max(np.abs(tables[1] - tables[0])))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+checkpoint.py:
+    Compact binary snapshots of a running simulation. A checkpoint holds the
+    swarm state (eta, nu, u_actual), the held control inputs, the step index,
+    the part of the recorded table filled so far and the state of every
+    controller and of the stop condition, so a run can be resumed after a crash
+    or forked into several continuations.
+"""
+import os
+import numpy as np
+
+
+def save_checkpoint(path, step, engine, controllers, recorder, u_control=None, stop_condition=None) -> None:
+    """
+    Writes the state before simulation step `step` to `path` (.npz). The file is
+    replaced atomically, so an interrupted write never destroys the previous one.
+    """
+    state = {
+        "step": np.array(step),
+        "eta": engine.eta,
+        "nu": engine.nu,
+        "u_actual": engine.u_actual,
+        "sim_data": recorder.recorded(step),
+    }
+    if u_control is not None:
+        state["u_control"] = u_control
+    for scenario, controller in enumerate(controllers):
+        for key, value in controller.get_state(step).items():
+            state[f"controller{scenario}/{key}"] = value
+        if stop_condition is not None:
+            for key, value in stop_condition.get_state(controller).items():
+                state[f"stop{scenario}/{key}"] = value
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as file:
+        np.savez_compressed(file, **state)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path) -> dict:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def restore_checkpoint(checkpoint, engine, controllers, recorder, stop_condition=None) -> int:
+    """
+    Restores a checkpoint loaded by load_checkpoint() into a freshly built engine,
+    its controllers and the recorder. The recording must be decimated as before. The controllers may be configured
+    differently (e.g. mu, f0 or a longer sim_time) to fork a continuation. The
+    stop condition must have been reset for the controllers.
+
+    Returns:
+    int: the step to continue from.
+    """
+    step = int(checkpoint["step"])
+    if checkpoint["eta"].shape != engine.eta.shape:
+        raise ValueError(f"Checkpoint holds {checkpoint['eta'].shape[0]} vehicles, "
+                         f"the simulation has {engine.number_of_vehicles}")
+    if step > controllers[0].N:
+        raise ValueError(f"Checkpoint at step {step} is beyond the simulation length {controllers[0].N}")
+    if checkpoint["sim_data"].shape[2] != recorder.recorded_rows(step):
+        raise ValueError(f"Checkpoint holds {checkpoint['sim_data'].shape[2]} recorded rows, "
+                         f"expected {recorder.recorded_rows(step)} for every {recorder.record_every} steps")
+
+    engine.eta[:] = checkpoint["eta"]
+    engine.nu[:] = checkpoint["nu"]
+    engine.u_actual[:] = checkpoint["u_actual"]
+    recorder.restore(step, checkpoint["sim_data"])
+    for scenario, controller in enumerate(controllers):
+        prefix = f"controller{scenario}/"
+        controller.set_state({key[len(prefix):]: value for key, value in checkpoint.items() if key.startswith(prefix)},
+                             step)
+        if stop_condition is not None:
+            prefix = f"stop{scenario}/"
+            stop_condition.set_state(controller, {key[len(prefix):]: value for key, value in checkpoint.items()
+                                                  if key.startswith(prefix)})
+    return step
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Control methods. The functions are elementwise, the arguments are scalars or
+arrays with one entry per vessel.
+
+Reference: T. I. Fossen (2021). Handbook of Marine Craft Hydrodynamics and
+Motion Control. 2nd. Edition, Wiley.
+URL: www.fossen.biz/wiley
+
+Author:     Thor I. Fossen
+"""
+
+import numpy as np
+
+
+#------------------------------------------------------------------------------
+
+def PIDpolePlacement(e_int, e_x, e_v, x_d, v_d, a_d, m, d, k, wn, zeta, h):
+    """
+    [u,e_int] = PIDpolePlacement(e_int,e_x,e_v,x_d,v_d,a_d,m,d,k,wn,zeta,h)
+    computes the PID control law with feedforward of the mass-damper-spring
+    system m*a + d*v + k*x = u. The gains follow from pole placement with
+    natural frequency wn and relative damping ratio zeta, the integral state
+    e_int is propagated with Euler's method.
+    """
+
+    # PID gains based on pole placement
+    Kp = m * wn ** 2.0 - k
+    Kd = m * 2.0 * zeta * wn - d
+    Ki = (wn / 10.0) * Kp
+
+    # PID control law
+    u = -Kp * e_x - Kd * e_v - Ki * e_int
+
+    # Feedforward terms
+    u = u + m * a_d + d * v_d + k * x_d
+
+    # Integral error, Euler's method
+    e_int = e_int + h * e_x
+
+    return u, e_int
+
+
+#------------------------------------------------------------------------------
+
+def refModel3(x_d, v_d, a_d, r, v_max, zeta_d, w_d, h):
+    """
+    [x_d,v_d,a_d] = refModel3(x_d,v_d,a_d,r,v_max,zeta_d,w_d,h) is a 3rd-order
+    reference model for position, velocity and acceleration with input r,
+    velocity saturation v_max, relative damping ratio zeta_d and natural
+    frequency w_d, propagated with Euler's method.
+    """
+
+    # desired "jerk"
+    j_d = w_d ** 3 * (r - x_d) - (2 * zeta_d + 1) * w_d ** 2 * v_d - (2 * zeta_d + 1) * w_d * a_d
+
+    # Forward Euler integration
+    x_d = x_d + h * v_d  # desired position
+    v_d = v_d + h * a_d  # desired velocity
+    a_d = a_d + h * j_d  # desired acceleration
+
+    # Velocity saturation
+    v_d = np.clip(v_d, -v_max, v_max)
+
+    return x_d, v_d, a_d
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+currentField.py:
+    Spatially varying ocean current. The current is tabulated once on a regular
+    grid over the space, u is the east and v the north component in m/s, and is
+    interpolated bilinearly for all vehicles of a swarm with one batched lookup
+    per step. The regular grid is addressed arithmetically, so a query costs a
+    few array operations whatever the grid resolution.
+
+    The grid is generated analytically or loaded from an .npz file with the
+    arrays x (nx,), y (ny,), u and v (ny, nx); store() writes that file, so an
+    expensive field is computed once and reused by later runs.
+
+    uniform  constant current of a given speed and direction
+    vortex   Rankine vortex around the strongest intensity peak of the space
+"""
+import numpy as np
+from spaces import BaseSpace
+
+D2R = np.pi / 180  # degrees to radians
+
+
+class CurrentField:
+    def __init__(self, x, y, u, v, name='gridded'):
+        self.name = name
+        self.x = np.asarray(x, float)
+        self.y = np.asarray(y, float)
+        if len(self.x) < 2 or len(self.y) < 2:
+            raise ValueError("A current field needs at least 2 grid points along each axis")
+        self.dx = (self.x[-1] - self.x[0]) / (len(self.x) - 1)
+        self.dy = (self.y[-1] - self.y[0]) / (len(self.y) - 1)
+        if (not np.allclose(np.diff(self.x), self.dx) or not np.allclose(np.diff(self.y), self.dy)
+                or self.dx <= 0 or self.dy <= 0):
+            raise ValueError("The current field grid must be regular and increasing")
+        self.uv = np.stack((np.asarray(u, float), np.asarray(v, float)), axis=-1)  # (ny, nx, 2)
+        if self.uv.shape[:2] != (len(self.y), len(self.x)):
+            raise ValueError(f"u and v must have the shape {(len(self.y), len(self.x))}, got {self.uv.shape[:2]}")
+
+    def __str__(self):
+        speed = np.hypot(self.uv[..., 0], self.uv[..., 1])
+        return (f'---current field-------------------------------------------------------------------\n'
+                f'Type: {self.name}\n'
+                f'Grid: {len(self.x)}x{len(self.y)}, x in [{self.x[0]}, {self.x[-1]}], '
+                f'y in [{self.y[0]}, {self.y[-1]}]\n'
+                f'Speed: {speed.min():.3g}..{speed.max():.3g} m/s')
+
+    @classmethod
+    def uniform(cls, speed, direction, x_range, y_range):
+        """
+        Constant current of speed m/s flowing towards direction, degrees clockwise
+        from north like the vehicles' beta_current.
+        """
+        u = np.full((2, 2), speed * np.sin(direction * D2R))
+        v = np.full((2, 2), speed * np.cos(direction * D2R))
+        return cls(x_range, y_range, u, v, 'uniform')
+
+    @classmethod
+    def vortex(cls, speed, x_range, y_range, grid_size=200, center=(0, 0), radius=5.0):
+        """
+        Counterclockwise Rankine vortex: solid body rotation inside radius, the
+        tangential velocity reaches speed at radius and decays as 1/r outside.
+        """
+        x = np.linspace(*x_range, grid_size)
+        y = np.linspace(*y_range, grid_size)
+        dx, dy = np.meshgrid(x - center[0], y - center[1])
+        r = np.hypot(dx, dy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v_r = np.where(r <= radius, speed / radius, speed * radius / r ** 2)  # tangential velocity / r
+        return cls(x, y, -v_r * dy, v_r * dx, 'vortex')
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["x"], data["y"], data["u"], data["v"], str(path))
+
+    def store(self, path) -> None:
+        np.savez(path, x=self.x, y=self.y, u=self.uv[..., 0], v=self.uv[..., 1])
+
+    def query(self, x, y):
+        """
+        [u,v] = query(x,y) interpolates the east and north components of the current
+        bilinearly at arrays of points. Points off the grid get the current of the
+        nearest border.
+        """
+        nx, ny = len(self.x), len(self.y)
+        fx = np.clip((np.asarray(x, float) - self.x[0]) / self.dx, 0, nx - 1)
+        fy = np.clip((np.asarray(y, float) - self.y[0]) / self.dy, 0, ny - 1)
+        ix = np.minimum(fx.astype(int), nx - 2)
+        iy = np.minimum(fy.astype(int), ny - 2)
+        wx = (fx - ix)[..., None]
+        wy = (fy - iy)[..., None]
+        uv = self.uv
+        uv = ((uv[iy, ix] * (1 - wx) + uv[iy, ix + 1] * wx) * (1 - wy)
+              + (uv[iy + 1, ix] * (1 - wx) + uv[iy + 1, ix + 1] * wx) * wy)
+        return uv[..., 0], uv[..., 1]
+
+    def current(self, eta):
+        """
+        current = current(eta) returns the (n, 2) array of [V_c, beta_c] at the
+        positions of a swarm stored row-wise in an (n, 6) array, beta_c in radians
+        from north as the vehicle models expect it.
+        """
+        u, v = self.query(eta[:, 1], eta[:, 0])
+        return np.column_stack((np.hypot(u, v), np.arctan2(u, v)))
+
+
+def create_current_field(name, space: BaseSpace, speed=0.0, direction=0.0):
+    """
+    Creates the current field of the configuration: a stored .npz grid, or
+    'uniform' / 'vortex' of the given speed (and direction in degrees) over the
+    space. An empty name means no field, the vehicles keep their own V_current.
+    """
+    x_range = (space.x[0], space.x[-1])
+    y_range = (space.y[0], space.y[-1])
+    if not name:
+        return None
+    if name.endswith('.npz'):
+        return CurrentField.load(name)
+    if name == 'uniform':
+        return CurrentField.uniform(speed, direction, x_range, y_range)
+    if name == 'vortex':
+        peak = np.unravel_index(np.argmax(space.get_Z()), np.shape(space.get_Z()))
+        return CurrentField.vortex(speed, x_range, y_range, space.grid_size,
+                                   center=(space.get_X()[peak], space.get_Y()[peak]))
+    raise ValueError(f"Unknown current field: {name}")
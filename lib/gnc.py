@@ -12,6 +12,12 @@ Author:     Thor I. Fossen
 
 import numpy as np
 import math
+from functools import lru_cache
+from tools.backend import jit, use_jit
+
+# yaw rates below are treated as zero by the cross-flow drag: the zero crossing
+# -v_r / r of the strip velocity is then far outside the hull (or overflows)
+CROSSFLOW_R_MIN = 1e-9
 
 
 #------------------------------------------------------------------------------
@@ -129,6 +135,8 @@ def attitudeEuler(eta, nu, sampleTime):
     eta = attitudeEuler(eta,nu,sampleTime) computes the generalized 
     position/Euler angles eta[k+1]
     """
+    if use_jit():
+        return attitudeEulerKernel(eta, nu, sampleTime)
 
     p_dot = np.matmul(Rzyx(eta[3], eta[4], eta[5]), nu[0:3])
     v_dot = np.matmul(Tzyx(eta[3], eta[4]), nu[3:6])
@@ -140,6 +148,81 @@ def attitudeEuler(eta, nu, sampleTime):
     return eta
 
 
+#------------------------------------------------------------------------------
+
+@jit
+def attitudeEulerKernel(eta, nu, sampleTime):
+    """
+    eta = attitudeEulerKernel(eta,nu,sampleTime) is attitudeEuler() with the
+    rotations Rzyx and Tzyx applied in closed form, for the 'numba' backend
+    """
+    cphi = math.cos(eta[3])
+    sphi = math.sin(eta[3])
+    cth = math.cos(eta[4])
+    sth = math.sin(eta[4])
+    cpsi = math.cos(eta[5])
+    spsi = math.sin(eta[5])
+    u, v, w, p, q, r = nu[0], nu[1], nu[2], nu[3], nu[4], nu[5]
+
+    # Forward Euler integration
+    eta[0] += sampleTime * (cpsi * cth * u + (-spsi * cphi + cpsi * sth * sphi) * v
+                            + (spsi * sphi + cpsi * cphi * sth) * w)
+    eta[1] += sampleTime * (spsi * cth * u + (cpsi * cphi + sphi * sth * spsi) * v
+                            + (-cpsi * sphi + sth * spsi * cphi) * w)
+    eta[2] += sampleTime * (-sth * u + cth * sphi * v + cth * cphi * w)
+    eta[3] += sampleTime * (p + (sphi * q + cphi * r) * sth / cth)
+    eta[4] += sampleTime * (cphi * q - sphi * r)
+    eta[5] += sampleTime * (sphi * q + cphi * r) / cth
+
+    return eta
+
+
+#------------------------------------------------------------------------------
+
+def kinematicsBatch(eta, nu):
+    """
+    eta_dot = kinematicsBatch(eta,nu) computes the generalized position/Euler
+    angle rates eta_dot = J(eta) * nu for a batch of vehicles stored row-wise in
+    (n, 6) arrays. The rotations Rzyx and Tzyx are applied in closed form.
+    """
+
+    cphi = np.cos(eta[:, 3])
+    sphi = np.sin(eta[:, 3])
+    cth = np.cos(eta[:, 4])
+    sth = np.sin(eta[:, 4])
+    cpsi = np.cos(eta[:, 5])
+    spsi = np.sin(eta[:, 5])
+    u, v, w, p, q, r = nu.T
+
+    eta_dot = np.empty_like(eta)
+
+    # p_dot = Rzyx(phi,theta,psi) * nu[0:3]
+    eta_dot[:, 0] = cpsi * cth * u + (-spsi * cphi + cpsi * sth * sphi) * v + (spsi * sphi + cpsi * cphi * sth) * w
+    eta_dot[:, 1] = spsi * cth * u + (cpsi * cphi + sphi * sth * spsi) * v + (-cpsi * sphi + sth * spsi * cphi) * w
+    eta_dot[:, 2] = -sth * u + cth * sphi * v + cth * cphi * w
+
+    # v_dot = Tzyx(phi,theta) * nu[3:6]
+    eta_dot[:, 3] = p + (sphi * q + cphi * r) * sth / cth
+    eta_dot[:, 4] = cphi * q - sphi * r
+    eta_dot[:, 5] = (sphi * q + cphi * r) / cth
+
+    return eta_dot
+
+
+#------------------------------------------------------------------------------
+
+def attitudeEulerBatch(eta, nu, sampleTime):
+    """
+    eta = attitudeEulerBatch(eta,nu,sampleTime) computes eta[k+1] for a batch of
+    vehicles stored row-wise in (n, 6) arrays. eta is updated in place.
+    """
+
+    # Forward Euler integration
+    eta += sampleTime * kinematicsBatch(eta, nu)
+
+    return eta
+
+
 #------------------------------------------------------------------------------
 
 def m2c(M, nu):
@@ -184,12 +267,172 @@ def m2c(M, nu):
 
 #------------------------------------------------------------------------------
 
+def satBatch(x, x_min, x_max):
+    """
+    x = satBatch(x,x_min,x_max) saturates an array of signals x such that
+    x_min <= x <= x_max elementwise
+    """
+    return np.clip(x, x_min, x_max)
+
+
+#------------------------------------------------------------------------------
+
+def SmtrxBatch(a):
+    """
+    S = SmtrxBatch(a) computes the stacked (n, 3, 3) skew-symmetric matrices S(a)
+    of the rows of an (n, 3) array a. The cross products a x b of the rows are
+    np.cross(a, b), which does not materialise S.
+    """
+
+    a = np.asarray(a, float)
+    S = np.zeros(a.shape[:-1] + (3, 3))
+    S[..., 0, 1] = -a[..., 2]
+    S[..., 0, 2] = a[..., 1]
+    S[..., 1, 0] = a[..., 2]
+    S[..., 1, 2] = -a[..., 0]
+    S[..., 2, 0] = -a[..., 1]
+    S[..., 2, 1] = a[..., 0]
+
+    return S
+
+
+#------------------------------------------------------------------------------
+
+def HmtrxBatch(r):
+    """
+    H = HmtrxBatch(r) computes the stacked (n, 6, 6) system transformation
+    matrices H(r) of the rows of an (n, 3) array r, see Hmtrx
+    """
+
+    r = np.asarray(r, float)
+    H = np.zeros(r.shape[:-1] + (6, 6))
+    H[..., range(6), range(6)] = 1
+    H[..., 0:3, 3:6] = np.swapaxes(SmtrxBatch(r), -1, -2)
+
+    return H
+
+
+#------------------------------------------------------------------------------
+
+def RzyxBatch(phi, theta, psi):
+    """
+    R = RzyxBatch(phi,theta,psi) computes the stacked (n, 3, 3) Euler angle
+    rotation matrices of arrays of Euler angles using the zyx convention.
+    R @ v of (n, 3) rows v is np.einsum('nij,nj->ni', R, v).
+    """
+
+    cphi = np.cos(phi)
+    sphi = np.sin(phi)
+    cth = np.cos(theta)
+    sth = np.sin(theta)
+    cpsi = np.cos(psi)
+    spsi = np.sin(psi)
+
+    R = np.empty(np.shape(cphi) + (3, 3))
+    R[..., 0, 0] = cpsi * cth
+    R[..., 0, 1] = -spsi * cphi + cpsi * sth * sphi
+    R[..., 0, 2] = spsi * sphi + cpsi * cphi * sth
+    R[..., 1, 0] = spsi * cth
+    R[..., 1, 1] = cpsi * cphi + sphi * sth * spsi
+    R[..., 1, 2] = -cpsi * sphi + sth * spsi * cphi
+    R[..., 2, 0] = -sth
+    R[..., 2, 1] = cth * sphi
+    R[..., 2, 2] = cth * cphi
+
+    return R
+
+
+#------------------------------------------------------------------------------
+
+def TzyxBatch(phi, theta):
+    """
+    T = TzyxBatch(phi,theta) computes the stacked (n, 3, 3) Euler angle attitude
+    transformation matrices using the zyx convention. The rows with
+    theta = +-90 degrees are singular and come out infinite.
+    """
+
+    cphi = np.cos(phi)
+    sphi = np.sin(phi)
+    cth = np.cos(theta)
+    sth = np.sin(theta)
+
+    T = np.zeros(np.shape(cphi) + (3, 3))
+    T[..., 0, 0] = 1
+    T[..., 0, 1] = sphi * sth / cth
+    T[..., 0, 2] = cphi * sth / cth
+    T[..., 1, 1] = cphi
+    T[..., 1, 2] = -sphi
+    T[..., 2, 1] = sphi / cth
+    T[..., 2, 2] = cphi / cth
+
+    return T
+
+
+#------------------------------------------------------------------------------
+
+def m2cBatch(M, nu):
+    """
+    C = m2cBatch(M,nu) computes the stacked Coriolis and centripetal matrices
+    C(nu) from the mass matrix M for the rows of an (n, 6) or (n, 3) array of
+    generalized velocities nu, see m2c
+    """
+
+    M = 0.5 * (M + M.T)  # systematization of the inertia matrix
+    nu = np.asarray(nu, float)
+
+    if nu.shape[-1] == 6:  # 6-DOF model
+        dt_dnu = nu @ M.T  # [dt_dnu1 dt_dnu2]
+        C = np.zeros(nu.shape[:-1] + (6, 6))
+        C[..., 0:3, 3:6] = -SmtrxBatch(dt_dnu[..., 0:3])
+        C[..., 3:6, 0:3] = C[..., 0:3, 3:6]
+        C[..., 3:6, 3:6] = -SmtrxBatch(dt_dnu[..., 3:6])
+
+    else:  # 3-DOF model (surge, sway and yaw)
+        C = np.zeros(nu.shape[:-1] + (3, 3))
+        C[..., 0, 2] = -M[1, 1] * nu[..., 1] - M[1, 2] * nu[..., 2]
+        C[..., 1, 2] = M[0, 0] * nu[..., 0]
+        C[..., 2, 0] = -C[..., 0, 2]
+        C[..., 2, 1] = -C[..., 1, 2]
+
+    return C
+
+
+#------------------------------------------------------------------------------
+
+def coriolisBatch(M, nu):
+    """
+    C_nu = coriolisBatch(M,nu) computes the Coriolis and centripetal forces
+    C(nu) * nu of m2c for the rows of an (n, 6) or (n, 3) array nu directly,
+    without materialising the matrices
+    """
+
+    M = 0.5 * (M + M.T)  # systematization of the inertia matrix
+    nu = np.asarray(nu, float)
+
+    if nu.shape[-1] == 6:  # 6-DOF model
+        dt_dnu = nu @ M.T
+        dt_dnu1 = dt_dnu[..., 0:3]
+        C_nu = np.concatenate((-np.cross(dt_dnu1, nu[..., 3:6]),
+                               -np.cross(dt_dnu1, nu[..., 0:3]) - np.cross(dt_dnu[..., 3:6], nu[..., 3:6])),
+                              axis=-1)
+
+    else:  # 3-DOF model (surge, sway and yaw)
+        c02 = -M[1, 1] * nu[..., 1] - M[1, 2] * nu[..., 2]
+        c12 = M[0, 0] * nu[..., 0]
+        C_nu = np.stack((c02 * nu[..., 2], c12 * nu[..., 2], -c02 * nu[..., 0] - c12 * nu[..., 1]), axis=-1)
+
+    return C_nu
+
+
+#------------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
 def Hoerner(B, T):
     """
     CY_2D = Hoerner(B,T)
     Hoerner computes the 2D Hoerner cross-flow form coeff. as a function of beam 
     B and draft T.The data is digitized and interpolation is used to compute 
-    other data point than those in the table
+    other data point than those in the table. The result is cached per hull.
     """
 
     # DATA = [B/2T  C_D]
@@ -209,12 +452,14 @@ def Hoerner(B, T):
 
 #------------------------------------------------------------------------------
 
-def crossFlowDrag(L, B, T, nu_r):
+@lru_cache(maxsize=None)
+def crossFlowStrips(L, B, T):
     """
-    tau_crossflow = crossFlowDrag(L,B,T,nu_r) computes the cross-flow drag 
-    integrals for a marine craft using strip theory. 
-
-    M d/dt nu_r + C(nu_r)*nu_r + D*nu_r + g(eta) = tau + tau_crossflow
+    [k,x0,dx,S] = crossFlowStrips(L,B,T) returns the strip constants of the
+    cross-flow drag of one hull, computed once per hull: the strip factor
+    k = 0.5 * rho * T * Cd_2D * dx, the first strip position x0, the strip length dx
+    and the cumulative power sums S[i,p] = sum(x[:i]**p), p = 0..3, of the strip
+    positions x = x0 + dx * [0..20].
     """
 
     rho = 1026  # density of water
@@ -223,19 +468,105 @@ def crossFlowDrag(L, B, T, nu_r):
     dx = L / 20
     Cd_2D = Hoerner(B, T)  # 2D drag coefficient based on Hoerner's curve
 
-    Yh = 0
-    Nh = 0
-    xL = -L / 2
+    x = -L / 2 + dx * np.arange(n + 1)  # strip positions
+    S = np.zeros((n + 2, 4))
+    S[1:] = np.cumsum(x[:, None] ** np.arange(4), axis=0)
+
+    return float(0.5 * rho * T * Cd_2D * dx), -L / 2, dx, S
+
+
+#------------------------------------------------------------------------------
+
+def crossFlowForces(L, B, T, v_r, r):
+    """
+    [Yh,Nh] = crossFlowForces(L,B,T,v_r,r) computes the cross-flow sway force and
+    yaw moment for the relative sway velocity v_r and yaw rate r, both floats or
+    both arrays.
+
+    The strip sum of |v_r + x*r| * (v_r + x*r) is evaluated in closed form: the
+    strip velocity is linear in x, so it is negative on one contiguous range of
+    strips [a, b) and the sum is a polynomial in v_r and r with the power sums of
+    x over the whole hull and over that range as coefficients. A yaw rate below
+    CROSSFLOW_R_MIN is treated as zero.
+    """
+
+    k, x0, dx, S = crossFlowStrips(L, B, T)
+    n = len(S) - 1  # number of strip positions
+
+    if isinstance(v_r, float) and isinstance(r, float):
+        if abs(r) >= CROSSFLOW_R_MIN:
+            # strip index of the zero crossing, clamped so that it stays a finite integer
+            t = min(max((-v_r / r - x0) / dx, -1.0), n + 1.0)
+        if r >= CROSSFLOW_R_MIN:
+            a, b = 0, min(max(math.ceil(t), 0), n)
+        elif r <= -CROSSFLOW_R_MIN:
+            a, b = min(max(math.floor(t) + 1, 0), n), n
+        else:
+            a, b = 0, (n if v_r < 0 else 0)
+        P0, P1, P2, P3 = S[n].tolist()
+        N0, N1, N2, N3 = (S[b] - S[a]).tolist()
+    else:
+        v_r, r = np.broadcast_arrays(np.asarray(v_r, float), np.asarray(r, float))
+        turning = np.abs(r) >= CROSSFLOW_R_MIN
+        t = np.clip((-v_r / np.where(turning, r, 1.0) - x0) / dx, -1.0, n + 1.0)
+        a = np.where(r <= -CROSSFLOW_R_MIN, np.clip(np.floor(t) + 1, 0, n), 0).astype(int)
+        b = np.where(r >= CROSSFLOW_R_MIN, np.clip(np.ceil(t), 0, n),
+                     np.where((r <= -CROSSFLOW_R_MIN) | (v_r < 0), n, 0)).astype(int)
+        P0, P1, P2, P3 = S[n]
+        N0, N1, N2, N3 = (S[b] - S[a]).T
+
+    vv, vr, rr = v_r * v_r, 2 * v_r * r, r * r
+    Yh = -k * (vv * P0 + vr * P1 + rr * P2 - 2 * (vv * N0 + vr * N1 + rr * N2))  # sway force
+    Nh = -k * (vv * P1 + vr * P2 + rr * P3 - 2 * (vv * N1 + vr * N2 + rr * N3))  # yaw moment
+
+    return Yh, Nh
 
-    for i in range(0, n + 1):
-        v_r = nu_r[1]  # relative sway velocity
-        r = nu_r[5]  # yaw rate
-        Ucf = abs(v_r + xL * r) * (v_r + xL * r)
-        Yh = Yh - 0.5 * rho * T * Cd_2D * Ucf * dx  # sway force
-        Nh = Nh - 0.5 * rho * T * Cd_2D * xL * Ucf * dx  # yaw moment
-        xL += dx
 
-    tau_crossflow = np.array([0, Yh, 0, 0, 0, Nh], float)
+#------------------------------------------------------------------------------
+
+@jit
+def crossFlowKernel(k, x0, dx, S, v_r, r):
+    """
+    [Yh,Nh] = crossFlowKernel(k,x0,dx,S,v_r,r) is crossFlowForces() for floats on
+    the strip constants of crossFlowStrips(), for the 'numba' backend
+    """
+    n = S.shape[0] - 1  # number of strip positions
+    t = 0.0
+    if abs(r) >= CROSSFLOW_R_MIN:
+        t = min(max((-v_r / r - x0) / dx, -1.0), n + 1.0)
+    if r >= CROSSFLOW_R_MIN:
+        a, b = 0, min(max(math.ceil(t), 0), n)
+    elif r <= -CROSSFLOW_R_MIN:
+        a, b = min(max(math.floor(t) + 1, 0), n), n
+    else:
+        a, b = 0, (n if v_r < 0 else 0)
+
+    vv, vr, rr = v_r * v_r, 2 * v_r * r, r * r
+    Yh = -k * (vv * S[n, 0] + vr * S[n, 1] + rr * S[n, 2]
+               - 2 * (vv * (S[b, 0] - S[a, 0]) + vr * (S[b, 1] - S[a, 1]) + rr * (S[b, 2] - S[a, 2])))
+    Nh = -k * (vv * S[n, 1] + vr * S[n, 2] + rr * S[n, 3]
+               - 2 * (vv * (S[b, 1] - S[a, 1]) + vr * (S[b, 2] - S[a, 2]) + rr * (S[b, 3] - S[a, 3])))
+
+    return Yh, Nh
+
+
+#------------------------------------------------------------------------------
+
+def crossFlowDrag(L, B, T, nu_r):
+    """
+    tau_crossflow = crossFlowDrag(L,B,T,nu_r) computes the cross-flow drag 
+    integrals for a marine craft using strip theory. nu_r is one relative
+    velocity vector (6,) or a batch of them (n, 6).
+
+    M d/dt nu_r + C(nu_r)*nu_r + D*nu_r + g(eta) = tau + tau_crossflow
+    """
+
+    nu_r = np.asarray(nu_r, float)
+    tau_crossflow = np.zeros(nu_r.shape)
+    if nu_r.ndim == 1:
+        tau_crossflow[1], tau_crossflow[5] = crossFlowForces(L, B, T, float(nu_r[1]), float(nu_r[5]))
+    else:
+        tau_crossflow[:, 1], tau_crossflow[:, 5] = crossFlowForces(L, B, T, nu_r[:, 1], nu_r[:, 5])
 
     return tau_crossflow
 
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+integrators.py:
+    Integrators used by the swarm engine to propagate a group of vehicles over
+    one sample period. The control inputs are held over the whole period, so the
+    controllers keep their sample clock whatever integrator is selected.
+
+    euler   the vehicle's own dynamics_batch() and repositioning_batch()
+    rk4     classical 4th-order Runge-Kutta, one step per sample
+    rk45    adaptive Dormand-Prince 5(4) with error control, the sample period
+            is split in as many sub-steps as the tolerances require
+    exact   the vehicle's analytic solution advance_batch() over the whole
+            period, for models whose motion under held inputs is known in
+            closed form (the Dubins arcs)
+"""
+import numpy as np
+
+
+class Integrator:
+    name = 'integrator'
+
+    def __init__(self):
+        self.steps = 0  # accepted integration steps
+        self.evaluations = 0  # calls of derivatives_batch()
+
+    def step(self, vehicle, eta, nu, u_actual, u_control, sample_time, current=None):
+        """
+        [eta,nu,u_actual] = step(vehicle,eta,nu,u_actual,u_control,sample_time,current)
+        advances a group of vehicles of the same type by one sample period.
+        """
+        pass
+
+    def statistics(self) -> dict:
+        return {"integrator": self.name,
+                "steps": self.steps,
+                "evaluations": self.evaluations}
+
+    def _derivatives(self, vehicle, eta, nu, u_actual, u_control, current):
+        self.evaluations += 1
+        return vehicle.derivatives_batch(eta, nu, u_actual, u_control, current)
+
+
+class Euler(Integrator):
+    name = 'euler'
+
+    def step(self, vehicle, eta, nu, u_actual, u_control, sample_time, current=None):
+        nu, u_actual = vehicle.dynamics_batch(eta, nu, u_actual, u_control, sample_time, current)
+        eta = vehicle.repositioning_batch(eta, nu, sample_time)
+        self.steps += 1
+        self.evaluations += 1
+        return eta, nu, u_actual
+
+
+class RK4(Integrator):
+    name = 'rk4'
+
+    def step(self, vehicle, eta, nu, u_actual, u_control, sample_time, current=None):
+        h = sample_time
+        args = (u_actual, u_control, current)
+        k1_eta, k1_nu = self._derivatives(vehicle, eta, nu, *args)
+        k2_eta, k2_nu = self._derivatives(vehicle, eta + h / 2 * k1_eta, nu + h / 2 * k1_nu, *args)
+        k3_eta, k3_nu = self._derivatives(vehicle, eta + h / 2 * k2_eta, nu + h / 2 * k2_nu, *args)
+        k4_eta, k4_nu = self._derivatives(vehicle, eta + h * k3_eta, nu + h * k3_nu, *args)
+
+        eta = eta + h / 6 * (k1_eta + 2 * k2_eta + 2 * k3_eta + k4_eta)
+        nu = nu + h / 6 * (k1_nu + 2 * k2_nu + 2 * k3_nu + k4_nu)
+        self.steps += 1
+
+        nu, u_actual = vehicle.actuators_batch(eta, nu, u_actual, u_control)
+        return eta, nu, u_actual
+
+
+class RK45(Integrator):
+    name = 'rk45'
+
+    # Dormand-Prince 5(4) Butcher tableau
+    A = [
+        [],
+        [1 / 5],
+        [3 / 40, 9 / 40],
+        [44 / 45, -56 / 15, 32 / 9],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+        [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+    ]
+    B5 = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+    B4 = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+    def __init__(self, rtol=1e-6, atol=1e-8, safety=0.9, min_factor=0.2, max_factor=5.0, min_step=1e-12):
+        super().__init__()
+        self.rtol = rtol
+        self.atol = atol
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.min_step = min_step  # smallest step size, a fraction of the sample period
+        self.h = None  # step size, carried over between sample periods
+        self.rejected = 0
+        self.max_error = 0.0  # largest accepted local error estimate
+        self.min_h = np.inf
+        self.max_h = 0.0
+
+    def statistics(self) -> dict:
+        statistics = super().statistics()
+        statistics.update({"rejected": self.rejected,
+                           "max_error": self.max_error,
+                           "min_step": float(self.min_h),
+                           "max_step": float(self.max_h)})
+        return statistics
+
+    def step(self, vehicle, eta, nu, u_actual, u_control, sample_time, current=None):
+        args = (u_actual, u_control, current)
+        n = len(eta)
+        y = np.hstack((eta, nu))
+        h = sample_time if self.h is None else self.h
+        t = 0.0
+        while t < sample_time:
+            # do not leave a sliver at the end of the sample period
+            h_step = sample_time - t if t + 1.01 * h >= sample_time else h
+            k = []
+            for stage in self.A:
+                y_stage = y.copy()
+                for a, k_j in zip(stage, k):
+                    if a:
+                        y_stage += h_step * a * k_j
+                k_eta, k_nu = self._derivatives(vehicle, y_stage[:, :6], y_stage[:, 6:], *args)
+                k.append(np.hstack((k_eta, k_nu)))
+            k = np.array(k)
+            y5 = y + h_step * np.tensordot(self.B5, k, axes=1)
+            error = h_step * np.tensordot(self.B5 - self.B4, k, axes=1)
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y5))
+            error_norm = np.sqrt(np.mean((error / scale) ** 2)) if n else 0.0
+            if not np.isfinite(error_norm):
+                raise RuntimeError(f"RK45 error estimate is not finite at t = {t} s of the sample period, "
+                                   f"the state of {vehicle.name} diverged")
+
+            if error_norm <= 1.0:
+                t += h_step
+                y = y5
+                self.steps += 1
+                self.max_error = max(self.max_error, float(np.max(np.abs(error))) if n else 0.0)
+                self.min_h = min(self.min_h, h_step)
+                self.max_h = max(self.max_h, h_step)
+            else:
+                self.rejected += 1
+
+            factor = self.max_factor if error_norm == 0 else self.safety * error_norm ** -0.2
+            h_next = h_step * min(self.max_factor, max(self.min_factor, factor))
+            # a step shortened to the end of the period does not shrink the step size
+            h = max(h, h_next) if error_norm <= 1.0 and h_step < h else h_next
+            if h < self.min_step * sample_time:
+                raise RuntimeError(f"RK45 step size {h} s fell below {self.min_step} of the sample period at "
+                                   f"t = {t} s, the tolerances rtol={self.rtol}, atol={self.atol} cannot be met")
+        self.h = h
+
+        eta, nu = y[:, :6], y[:, 6:]
+        nu, u_actual = vehicle.actuators_batch(eta, nu, u_actual, u_control)
+        return eta, nu, u_actual
+
+
+class Exact(Integrator):
+    name = 'exact'
+
+    def step(self, vehicle, eta, nu, u_actual, u_control, sample_time, current=None):
+        eta, nu = vehicle.advance_batch(eta, nu, u_actual, u_control, sample_time)
+        self.steps += 1
+        return eta, nu, u_actual
+
+
+integrator_instance = {}
+
+# Register decorator
+def register_integrator(cls):
+    integrator_instance[cls.name] = cls
+    return cls
+
+def create_integrator(class_name: str, **arguments) -> Integrator:
+    if class_name in integrator_instance:
+        return integrator_instance[class_name](**arguments)
+    else:
+        raise ValueError(f"Unknown integrator name: {class_name}")
+
+register_integrator(Euler)
+register_integrator(RK4)
+register_integrator(RK45)
+register_integrator(Exact)
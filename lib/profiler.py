@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+profiler.py:
+    Low-overhead timers and counters for the phases of a simulation step. The
+    loop times its own phases (control, engine step, recording, ...) and the
+    profiler wraps the hot methods of the space and vehicle classes, so
+    get_intensity(), get_nearest_contour_points(), the dynamics and the
+    repositioning are timed without touching their code. Every phase keeps its
+    total time, number of calls and a histogram of the time spent per step in
+    power-of-two nanosecond bins.
+
+    NullProfiler is the default of the loop and costs one method call per phase.
+"""
+import json
+from time import perf_counter_ns
+
+
+class Profiler:
+    def __init__(self):
+        self.totals = {}  # ns per phase
+        self.calls = {}
+        self.histograms = {}  # phase -> {bit length of the ns spent in a step: steps}
+        self.step_ns = {}  # ns per phase in the current step
+        self.steps = 0
+        self.step_started = None
+        self.instrumented = []
+
+    def __str__(self):
+        total = self.totals.get('step', 0) or 1
+        summary = (f'---profile-------------------------------------------------------------------------\n'
+                   f'{"phase":<32}{"total, s":>10}{"share":>8}{"calls":>10}{"per step, us":>14}')
+        for phase, ns in sorted(self.totals.items(), key=lambda item: -item[1]):
+            summary += (f'\n{phase:<32}{ns / 1e9:>10.3f}{100 * ns / total:>7.1f}%{self.calls[phase]:>10}'
+                        f'{ns / 1e3 / max(1, self.steps):>14.1f}')
+        return summary
+
+    def start(self) -> int:
+        return perf_counter_ns()
+
+    def stop(self, phase, started) -> None:
+        self.add(phase, perf_counter_ns() - started)
+
+    def add(self, phase, ns) -> None:
+        self.totals[phase] = self.totals.get(phase, 0) + ns
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.step_ns[phase] = self.step_ns.get(phase, 0) + ns
+
+    def end_step(self) -> None:
+        """
+        Closes a simulation step, its duration since the previous call is the 'step'
+        phase. The first call only starts the clock.
+        """
+        now = perf_counter_ns()
+        if self.step_started is not None:
+            self.add('step', now - self.step_started)
+            self.steps += 1
+            for phase, ns in self.step_ns.items():
+                histogram = self.histograms.setdefault(phase, {})
+                histogram[ns.bit_length()] = histogram.get(ns.bit_length(), 0) + 1
+        self.step_ns.clear()
+        self.step_started = now
+
+    def instrument(self, obj, method, phase) -> None:
+        """
+        Times every call of obj.method() as phase until release() is called. The
+        method is wrapped on the class of obj, so the instances stay untouched (the
+        vehicles have no __dict__) and all instances of the class are timed. A
+        method that is already timed, e.g. inherited from an instrumented class,
+        is not wrapped again.
+        """
+        cls = type(obj)
+        original = getattr(cls, method)
+        if getattr(original, 'profiled', False):
+            return
+
+        def timed(*args, **kwargs):
+            started = perf_counter_ns()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter_ns() - started)
+
+        timed.profiled = True
+        # only methods defined by cls itself are restored, inherited ones are removed again
+        self.instrumented.append((cls, method, cls.__dict__.get(method)))
+        setattr(cls, method, timed)
+
+    def release(self) -> None:
+        for cls, method, own in reversed(self.instrumented):
+            if own is None:
+                delattr(cls, method)
+            else:
+                setattr(cls, method, own)
+        self.instrumented.clear()
+
+    def get_json_data(self):
+        return {
+            "steps": self.steps,
+            "phases": {
+                phase: {
+                    "total_s": ns / 1e9,
+                    "calls": self.calls[phase],
+                    "per_step_us": ns / 1e3 / max(1, self.steps),
+                    # steps by time spent in the phase, keyed by the lower bin edge in ns
+                    "histogram_ns": {str(1 << bits >> 1): count
+                                     for bits, count in sorted(self.histograms.get(phase, {}).items())},
+                } for phase, ns in self.totals.items()
+            }
+        }
+
+    def store(self, path) -> None:
+        with open(path, 'w') as profile:
+            json.dump(self.get_json_data(), profile, indent=4)
+
+
+class NullProfiler(Profiler):
+    def __str__(self):
+        return ''
+
+    def start(self) -> int:
+        return 0
+
+    def stop(self, phase, started) -> None:
+        pass
+
+    def end_step(self) -> None:
+        pass
+
+    def instrument(self, obj, method, phase) -> None:
+        pass
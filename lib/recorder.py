@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+recorder.py:
+    Streaming recorder of the simulation table. Every record_every-th step of the
+    (M, n_vehicles, N, channels) table is kept, either in RAM or, when a
+    DataStorage is given, in a memory-mapped 'sim_data' .npy file of its result
+    folder. File-backed rows are collected in a small RAM chunk and written to
+    disk chunk by chunk, so long runs of large swarms need bounded memory.
+"""
+import numpy as np
+
+
+class Recorder:
+    def __init__(self, M, n, N, channels, record_every=1, data_storage=None, chunk_rows=256):
+        self.record_every = max(1, int(record_every))
+        shape = (M, n, self.recorded_rows(N), channels)
+        if data_storage is None:
+            self.data = np.empty(shape, float)
+            self.chunk = None
+        else:
+            self.data = data_storage.open_array('sim_data', shape)
+            self.chunk = np.empty((M, n, min(chunk_rows, shape[2]), channels), float)
+        self.chunk_start = 0  # first row held by the chunk
+        self.chunk_filled = 0  # rows of the chunk written so far
+
+    def __str__(self):
+        return (f'---recorder------------------------------------------------------------------------\n'
+                f'Recorded steps: every {self.record_every}, {self.data.shape[2]} rows\n'
+                f'Storage: {self.data.filename if self.chunk is not None else "memory"}')
+
+    def recorded_rows(self, steps) -> int:
+        return (steps + self.record_every - 1) // self.record_every
+
+    def write(self, step, channels, values) -> None:
+        """
+        Writes values (M, n_vehicles, ...) into the channels (a slice) of step's row,
+        nothing is written for the steps skipped by the decimation.
+        """
+        if step % self.record_every:
+            return
+        row = step // self.record_every
+        if self.chunk is None:
+            self.data[:, :, row, channels] = values
+            return
+        if not self.chunk_start <= row < self.chunk_start + self.chunk.shape[2]:
+            self.sync()
+            self.chunk_start = row
+            self.chunk_filled = 0
+        self.chunk[:, :, row - self.chunk_start, channels] = values
+        self.chunk_filled = max(self.chunk_filled, row - self.chunk_start + 1)
+
+    def sync(self) -> None:
+        """
+        Writes the rows of the chunk to the file. The chunk is kept, so rows that
+        are still being filled can be completed and written again.
+        """
+        if self.chunk is not None and self.chunk_filled:
+            self.data[:, :, self.chunk_start:self.chunk_start + self.chunk_filled] = self.chunk[:, :, :self.chunk_filled]
+
+    def recorded(self, steps) -> np.ndarray:
+        """
+        Returns the rows of the first steps simulation steps.
+        """
+        self.sync()
+        return self.data[:, :, :self.recorded_rows(steps)]
+
+    def restore(self, steps, data) -> None:
+        self.data[:, :, :self.recorded_rows(steps)] = data
+        self.chunk_start = self.recorded_rows(steps)
+        self.chunk_filled = 0
+
+    def finish(self, steps) -> np.ndarray:
+        """
+        Writes the pending rows and returns the table of the first steps simulation steps.
+        """
+        data = self.recorded(steps)
+        if self.chunk is not None:
+            self.data.flush()
+        return data
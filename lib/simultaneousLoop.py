@@ -1,59 +1,243 @@
-
 import numpy as np
+from typing import NamedTuple
 from collections.abc import Sequence
 from vehicles import *
-from .gnc import attitudeEuler
+from .swarmEngine import SwarmEngine
+from .currentField import CurrentField
+from .recorder import Recorder
+from .profiler import Profiler, NullProfiler
+from .stopConditions import StopCondition
+from .checkpoint import save_checkpoint, load_checkpoint, restore_checkpoint
 from tqdm import tqdm
 from controllers import BaseController
 
 
-def simultaneous_simulate(controller: BaseController):
-    DOF = 6  # degrees of freedom
-    t = 0  # initial simulation time
-
-    m_nu = []
-    m_u_actual = []
-    m_eta = []
-
-    # Initial state vectors
-    for vehicle in controller.vehicles:
-        # position/attitude, user editable
-        m_eta.append(np.array([vehicle.starting_point[1], vehicle.starting_point[0], 0, 0, 0, 0], float))
-
-        # velocity, defined by vehicle class
-        m_nu.append(vehicle.nu)
-
-        # actual inputs, defined by vehicle class
-        m_u_actual.append(vehicle.u_actual)
-
-    # Initialization of table used to store the simulation data
-    sim_data = [np.empty([controller.N, 2 * DOF + 2 * vehicle.dimU], float) for vehicle in controller.vehicles]
-
-    # Simulator for-loop
-    for i in tqdm(range(0, controller.N), desc=f"Vehicle Simulation x{controller.number_of_vehicles}"):
-
-        m_u_control = controller.generate_control(m_eta, i)
-
-        for vehicle in controller.vehicles:
-            eta = m_eta[vehicle.serial_number]
-            nu = m_nu[vehicle.serial_number]
-            u_actual = m_u_actual[vehicle.serial_number]
-            u_control = m_u_control[vehicle.serial_number]
-
-            # t = i * sample_time  # simulation time
-            # Store simulation data in simData
-            signals = np.hstack((eta, nu, u_control, u_actual))
-            sim_data[vehicle.serial_number][i, :] = signals
-
-            # Propagate vehicle attitude and  dynamics
-            [nu, u_actual] = vehicle.dynamics(eta, nu, u_actual, u_control, controller.sample_time)
-            eta = vehicle.repositioning(eta, nu, controller.sample_time)
-
-            m_eta[vehicle.serial_number] = eta
-            m_nu[vehicle.serial_number] = nu
-            m_u_actual[vehicle.serial_number] = u_actual
+def simultaneous_simulate(controller: BaseController, stop_condition: StopCondition = None, checkpoint_every=0,
+                          checkpoint_path=None, resume_from=None, profiler: Profiler = None,
+                          current_field: CurrentField = None):
+    return ensemble_simulate([controller], stop_condition, checkpoint_every, checkpoint_path, resume_from, profiler,
+                             current_field)[0]
+
+
+def ensemble_simulate(controllers: Sequence[BaseController], stop_condition: StopCondition = None, checkpoint_every=0,
+                      checkpoint_path=None, resume_from=None, profiler: Profiler = None,
+                      current_field: CurrentField = None):
+    """
+    Runs M independent scenarios over the same space in one vectorized pass.
+
+    Every controller describes one scenario with its own vehicles (start points,
+    V_current, shift_vehicle) and control parameters (mu, f0). All scenarios must
+    share the sample time, the simulation time and the number of vehicles. The state
+    of the whole ensemble is advanced by one SwarmEngine, so identical vehicle types
+    of all scenarios are propagated with a single batched call per step.
+
+    If a stop_condition is given, the run ends as soon as it holds for every
+    scenario; the recorded data and the controllers are truncated to that step.
+
+    With checkpoint_every > 0 the full state is written every checkpoint_every steps
+    to checkpoint_path (by default the 'checkpoint' file of the first controller's
+    DataStorage). resume_from is a checkpoint file to continue from, the stop
+    condition continues from its saved state.
+
+    The table keeps every controller.record_every-th step; with controller.store_raw
+    it is a memory-mapped file in the first controller's DataStorage.
+
+    A profiler times the phases of every step; its summary is printed and stored
+    as the 'profile' file of the first controller's DataStorage.
+
+    A current_field replaces the uniform current of the vehicles by the current
+    at their positions, looked up for the whole ensemble once per step.
+
+    Returns:
+    np.ndarray: (M, n_vehicles, N / record_every, 2 * DOF + 2 * dimU) table,
+                ensemble[m] is the simultaneous_simulate() result of scenario m.
+    """
+    DOF = SwarmEngine.DOF  # degrees of freedom
+    first = controllers[0]
+    M, n, N = _ensemble_shape(controllers)
+
+    # Initial state vectors, stored row-wise for the whole ensemble
+    engine = SwarmEngine([vehicle for controller in controllers for vehicle in controller.vehicles], current_field)
+
+    if profiler is None:
+        profiler = NullProfiler()
+
+    # Initialization of table used to store the simulation data,
+    # sim_data[scenario, serial_number] is the [N, 2 * DOF + 2 * dimU] table of one vehicle
+    recorder = Recorder(M, n, N, 2 * DOF + 2 * engine.dimU, first.record_every,
+                        first.data_storage if first.store_raw else None)
+    u_slice = slice(2 * DOF, 2 * DOF + engine.dimU)
+    u_actual_slice = slice(2 * DOF + engine.dimU, 2 * DOF + 2 * engine.dimU)
+
+    if stop_condition is not None:
+        for controller in controllers:
+            stop_condition.reset(controller)
+
+    start = 0
+    u_control = None
+    if resume_from:
+        checkpoint = load_checkpoint(resume_from)
+        start = restore_checkpoint(checkpoint, engine, controllers, recorder, stop_condition)
+        # a resumed run holds the last control inputs until the next control tick
+        u_control = checkpoint.get("u_control")
+        print(f'Resumed from {resume_from} at {round(start * first.sample_time, 2)} seconds')
+    if checkpoint_every and checkpoint_path is None:
+        checkpoint_path = first.data_storage.get_path('checkpoint', 'npz')
+
+    def store_state(step, view):
+        recorder.write(step, slice(0, DOF), view.eta)
+        recorder.write(step, slice(DOF, 2 * DOF), view.nu)
+        recorder.write(step, u_actual_slice, view.u_actual)
+
+    # Store simulation data in simData, the state after step i is the state before step i + 1
+    store_state(start, _state_view(engine, M, n))
+
+    description = f"Vehicle Simulation x{n}" if M == 1 else f"Ensemble Simulation {M}x{n}"
+    steps = ensemble_steps(controllers, engine=engine, start=start, u_control=u_control, profiler=profiler)
+    # the profiler patches the classes, they are restored however the loop ends
+    for space in {id(controller.space): controller.space for controller in controllers}.values():
+        profiler.instrument(space, 'get_intensity', 'get_intensity')
+        profiler.instrument(space, 'get_nearest_contour_points', 'nearest_contour')
+    if current_field is not None:
+        profiler.instrument(current_field, 'current', 'current_field')
+    for vehicle, _, _ in engine.groups:
+        profiler.instrument(vehicle, 'dynamics_batch', 'dynamics')
+        profiler.instrument(vehicle, 'derivatives_batch', 'dynamics')
+        profiler.instrument(vehicle, 'repositioning_batch', 'repositioning')
+    try:
+        # Simulator for-loop
+        progress = tqdm(steps, desc=description, initial=start, total=N)
+        profiler.end_step()
+        for view in progress:
+            i = view.step
+            started = profiler.start()
+            recorder.write(i, u_slice, view.u_control)
+            if i + 1 < N:
+                store_state(i + 1, view)
+            profiler.stop('recording', started)
+
+            # every scenario is checked, the stop conditions keep a state per scenario
+            started = profiler.start()
+            stop = stop_condition is not None and all([stop_condition(controller, i) for controller in controllers])
+            profiler.stop('stop_condition', started)
+            if stop:
+                progress.close()
+                print(f'Stop condition reached at {round(i * first.sample_time, 2)} seconds')
+                N = i + 1
+                for controller in controllers:
+                    controller.truncate(N)
+                break
+
+            if checkpoint_every and (i + 1) % checkpoint_every == 0 and i + 1 < N:
+                started = profiler.start()
+                save_checkpoint(checkpoint_path, i + 1, engine, controllers, recorder, view.u_control,
+                                stop_condition)
+                profiler.stop('checkpoint', started)
+            profiler.end_step()
+        steps.close()
+        sim_data = recorder.finish(N)
+    finally:
+        profiler.release()
+
+    if profiler.steps:
+        print(profiler)
+        if first.data_storage is not None:
+            profiler.store(first.data_storage.get_path('profile', 'json'))
+
+    if any(vehicle.integrator != 'euler' for vehicle in engine.vehicles):
+        print(engine.integration_report())
 
     # Store simulation time vector
     # controller.set_sim_time(np.arange(start=0, stop=t + sample_time, step=sample_time)[:, None])
 
     return sim_data
+
+
+class SimulationStep(NamedTuple):
+    step: int  # index of the step just simulated
+    time: float  # simulation time after the step
+    eta: np.ndarray  # state after the step
+    nu: np.ndarray
+    u_actual: np.ndarray
+    u_control: np.ndarray  # control inputs applied during the step
+
+
+def simulate_steps(controller: BaseController, every=1, current_field: CurrentField = None):
+    """
+    Step-wise form of simultaneous_simulate(). Yields a SimulationStep after every
+    `every` steps (and after the last one) with (n_vehicles, ...) read-only views of
+    the live state. Nothing is recorded, the views are overwritten by the next step,
+    so copy whatever has to be kept.
+    """
+    for view in ensemble_steps([controller], every, current_field=current_field):
+        yield SimulationStep(view.step, view.time, view.eta[0], view.nu[0], view.u_actual[0], view.u_control[0])
+
+
+def ensemble_steps(controllers: Sequence[BaseController], every=1, engine: SwarmEngine = None, start=0,
+                   u_control=None, profiler: Profiler = None, current_field: CurrentField = None):
+    """
+    Step-wise form of ensemble_simulate(). Yields a SimulationStep after every
+    `every` steps (and after the last one) with (M, n_vehicles, ...) read-only views
+    of the live state. engine, start and the held u_control continue an existing
+    engine, e.g. one restored from a checkpoint. current_field is used by the
+    engine built when none is given.
+
+    Each controller is asked for new control inputs from the measured positions and
+    velocities every controller.control_every steps; in between its inputs are held
+    (zero-order hold). A profiler times the control and engine phases.
+    """
+    first = controllers[0]
+    M, n, N = _ensemble_shape(controllers)
+    if profiler is None:
+        profiler = NullProfiler()
+    if engine is None:
+        engine = SwarmEngine([vehicle for controller in controllers for vehicle in controller.vehicles], current_field)
+
+    # (M, n_vehicles, DOF) views of the engine state
+    m_eta = engine.eta.reshape(M, n, SwarmEngine.DOF)
+    m_nu = engine.nu.reshape(M, n, SwarmEngine.DOF)
+    m_u_control = np.zeros((M, n, engine.dimU), float)
+    if u_control is not None:
+        m_u_control[:] = u_control
+    u_control_view = m_u_control.view()
+    u_control_view.flags.writeable = False
+    view = _state_view(engine, M, n)
+
+    for i in range(start, N):
+
+        started = profiler.start()
+        for scenario, controller in enumerate(controllers):
+            if i % controller.control_every == 0:
+                m_u_control[scenario] = controller.generate_control(m_eta[scenario], i, m_nu[scenario])
+            else:
+                controller.hold_control(i)
+        profiler.stop('generate_control', started)
+
+        # Propagate vehicle attitude and dynamics, one batched call per group
+        started = profiler.start()
+        engine.step(m_u_control.reshape(M * n, engine.dimU), first.sample_time)
+        profiler.stop('engine', started)
+
+        if (i + 1) % every == 0 or i + 1 == N:
+            yield SimulationStep(i, (i + 1) * first.sample_time, view.eta, view.nu, view.u_actual, u_control_view)
+
+
+def _ensemble_shape(controllers):
+    first = controllers[0]
+    for controller in controllers:
+        if (controller.N != first.N or controller.sample_time != first.sample_time
+                or controller.number_of_vehicles != first.number_of_vehicles
+                or controller.record_every != first.record_every):
+            raise ValueError("All scenarios of an ensemble must share sample_time, sim_time, record_every "
+                             "and number of vehicles")
+    return len(controllers), first.number_of_vehicles, first.N
+
+
+def _state_view(engine, M, n):
+    # read-only (M, n_vehicles, ...) views of the engine state
+    views = [engine.eta.reshape(M, n, SwarmEngine.DOF),
+             engine.nu.reshape(M, n, SwarmEngine.DOF),
+             engine.u_actual.reshape(M, n, engine.dimU)]
+    for array in views:
+        array.flags.writeable = False
+    return SimulationStep(0, 0.0, *views, None)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stopConditions.py:
+    Event-based early termination of the simulation loop. A stop condition is
+    called after every recorded step of every scenario and returns True once the
+    scenario may stop. The loop ends when all scenarios agree and the recorded
+    arrays are truncated to the steps simulated so far. get_state() and set_state()
+    carry the state of a scenario through a checkpoint.
+"""
+import numpy as np
+from controllers import BaseController
+
+
+class StopCondition:
+    name = 'stop_condition'
+
+    def reset(self, controller: BaseController) -> None:
+        pass
+
+    def __call__(self, controller: BaseController, step: int) -> bool:
+        return False
+
+    def get_state(self, controller: BaseController) -> dict:
+        return {}
+
+    def set_state(self, controller: BaseController, state: dict) -> None:
+        pass
+
+
+class AnyOf(StopCondition):
+    name = 'any_of'
+
+    def __init__(self, *conditions):
+        self.conditions = conditions
+
+    def reset(self, controller: BaseController) -> None:
+        for condition in self.conditions:
+            condition.reset(controller)
+
+    def __call__(self, controller: BaseController, step: int) -> bool:
+        return any(condition(controller, step) for condition in self.conditions)
+
+    def get_state(self, controller: BaseController) -> dict:
+        return {f"{index}/{key}": value for index, condition in enumerate(self.conditions)
+                for key, value in condition.get_state(controller).items()}
+
+    def set_state(self, controller: BaseController, state: dict) -> None:
+        for index, condition in enumerate(self.conditions):
+            prefix = f"{index}/"
+            condition.set_state(controller, {key[len(prefix):]: value for key, value in state.items()
+                                             if key.startswith(prefix)})
+
+
+class ConvergenceStop(StopCondition):
+    """
+    Stops once every agent has settled on the target isoline: the distance to the
+    contour stayed below distance_tol for hold_time seconds and the switching rate
+    of sigma (sign changes per second) is the same in both halves of that window
+    up to rate_tol, i.e. the agents circle the isoline in a steady regime. Only the
+    recorded steps are checked, so a decimated recording counts the switchings at
+    its own rate.
+    """
+    name = 'convergence'
+
+    def __init__(self, hold_time=10.0, distance_tol=0.5, rate_tol=0.5, check_time=1.0):
+        self.hold_time = hold_time
+        self.distance_tol = distance_tol
+        self.rate_tol = rate_tol
+        self.check_time = check_time
+        self.inside_since = {}
+
+    def __str__(self):
+        return (f'---stop condition------------------------------------------------------------------\n'
+                f'Convergence: distance < {self.distance_tol} m and switching rate within {self.rate_tol} 1/s '
+                f'for {self.hold_time} seconds')
+
+    def reset(self, controller: BaseController) -> None:
+        if not hasattr(controller, 'quality_array') or not hasattr(controller, 'sigmas'):
+            raise ValueError(f"{type(controller).__name__} does not record contour distances and sigmas")
+        # the switching rate of each half of the window needs at least one interval
+        if round(self.hold_time / controller.record_time) < 4:
+            raise ValueError(f"hold_time {self.hold_time} s must span at least 4 recorded steps of "
+                             f"{controller.record_time} s to compare the switching rates of its halves")
+        self.inside_since[id(controller)] = None
+
+    def __call__(self, controller: BaseController, step: int) -> bool:
+        key = id(controller)
+        column = controller.record_column(step)
+        if column is None:
+            return False
+        if np.any(controller.quality_array[:, column] > self.distance_tol):
+            self.inside_since[key] = None
+            return False
+        if self.inside_since[key] is None:
+            self.inside_since[key] = column
+
+        hold_steps = round(self.hold_time / controller.record_time)
+        check_steps = max(1, round(self.check_time / controller.record_time))
+        if column - self.inside_since[key] + 1 < hold_steps or column % check_steps:
+            return False
+
+        window = np.sign(controller.sigmas[:, column - hold_steps + 1:column + 1])
+        half = hold_steps // 2
+        half_time = half * controller.record_time
+        rate_first = np.count_nonzero(np.diff(window[:, :half]), axis=1) / half_time
+        rate_second = np.count_nonzero(np.diff(window[:, -half:]), axis=1) / half_time
+        return bool(np.all(np.abs(rate_first - rate_second) <= self.rate_tol))
+
+    def get_state(self, controller: BaseController) -> dict:
+        # the recorded column the agents settled at, -1 while they are off the isoline
+        inside_since = self.inside_since.get(id(controller))
+        return {"inside_since": np.array(-1 if inside_since is None else inside_since)}
+
+    def set_state(self, controller: BaseController, state: dict) -> None:
+        inside_since = int(state.get("inside_since", -1))
+        self.inside_since[id(controller)] = None if inside_since < 0 else inside_since
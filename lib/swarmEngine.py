@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+swarmEngine.py:
+    Structure-of-arrays state of a swarm. Positions, velocities and actuator
+    states of all vehicles are kept in contiguous (n_vehicles, 6) and
+    (n_vehicles, dimU) arrays. Vehicles sharing a group_key() and an integrator
+    are advanced with one batched integrator step per sample. With a current
+    field the current of every vehicle is looked up at its position before each
+    step, otherwise every vehicle keeps its own uniform current.
+"""
+import numpy as np
+from .integrators import create_integrator
+
+
+class SwarmEngine:
+    DOF = 6  # degrees of freedom
+
+    def __init__(self, vehicles, current_field=None):
+        self.vehicles = vehicles
+        self.current_field = current_field
+        self.number_of_vehicles = len(vehicles)
+        dim_u = {vehicle.dimU for vehicle in vehicles}
+        if len(dim_u) != 1:
+            raise ValueError(f"All vehicles of a swarm must have the same number of controls, got {dim_u}")
+        self.dimU = dim_u.pop()
+
+        self.eta = np.zeros((self.number_of_vehicles, self.DOF), float)
+        self.nu = np.zeros((self.number_of_vehicles, self.DOF), float)
+        self.u_actual = np.zeros((self.number_of_vehicles, self.dimU), float)
+        self.current = np.zeros((self.number_of_vehicles, 2), float)
+
+        # Initial state vectors
+        rows = {}
+        for row, vehicle in enumerate(vehicles):
+            # position/attitude, user editable
+            self.eta[row, 0:2] = vehicle.starting_point[1], vehicle.starting_point[0]
+            # velocity and actual inputs, defined by vehicle class
+            self.nu[row] = vehicle.nu
+            self.u_actual[row] = vehicle.u_actual
+            # current speed and direction
+            self.current[row] = vehicle.V_c, vehicle.beta_c
+            rows.setdefault((vehicle.group_key(), vehicle.integrator), []).append(row)
+
+        self.groups = [(vehicles[group[0]], self._rows_index(group), create_integrator(integrator))
+                       for (_, integrator), group in rows.items()]
+
+    def __str__(self):
+        return (f'---swarm engine--------------------------------------------------------------------\n'
+                f'Numbers of vehicles: {self.number_of_vehicles}\n'
+                f'Batched groups: {len(self.groups)}')
+
+    @staticmethod
+    def _rows_index(group):
+        # contiguous groups are addressed by a slice, so the state is updated without copies
+        if group == list(range(group[0], group[-1] + 1)):
+            return slice(group[0], group[-1] + 1)
+        return np.array(group)
+
+    def step(self, u_control, sample_time):
+        """
+        Propagates every group one sample forward with the control inputs u_control
+        of shape (n_vehicles, dimU).
+        """
+        if self.current_field is not None:
+            self.current[:] = self.current_field.current(self.eta)
+        for vehicle, rows, integrator in self.groups:
+            eta, nu, u_actual = integrator.step(vehicle, self.eta[rows], self.nu[rows], self.u_actual[rows],
+                                                u_control[rows], sample_time, self.current[rows])
+            self.eta[rows] = eta
+            self.nu[rows] = nu
+            self.u_actual[rows] = u_actual
+
+    def integration_report(self) -> str:
+        report = '---integration statistics----------------------------------------------------------'
+        for vehicle, rows, integrator in self.groups:
+            statistics = ', '.join(f'{key}: {value:.3g}' if isinstance(value, float) else f'{key}: {value}'
+                                   for key, value in integrator.statistics().items())
+            report += f'\n{vehicle.name} x{len(self.eta[rows])}: {statistics}'
+        return report
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+vectorEnv.py:
+    Gym-style vectorized environment for training learned controllers. A batch of
+    independent agents of one vehicle type moves in the intensity field of a space.
+    All agents are stepped by one SwarmEngine, and the intensity and contour
+    distance of all agents are evaluated with one batched call per step.
+
+    obs, info = env.reset(seed)
+    obs, reward, terminated, truncated, info = env.step(actions)
+
+    actions:      (num_envs, 2) propeller/wheel commands, clipped to [n_min, n_max]
+    observation:  [x, y, cos(psi), sin(psi), u, v, r, f, f_dot] per agent, where f is
+                  the intensity relative to the target isoline and f_dot its rate
+    reward:       -(|f| + distance_weight * distance to the nearest contour point)
+
+    A current_field (lib.currentField) makes the agents drift in the current at
+    their positions instead of their uniform V_current.
+
+    Agents leaving the space are terminated, agents reaching max_steps are
+    truncated; both are reset automatically and their last observation is
+    returned in info["final_observation"].
+"""
+import numpy as np
+import vehicles as vs
+from spaces import BaseSpace
+from .swarmEngine import SwarmEngine
+
+
+class VectorEnv:
+    observation_size = 9
+
+    def __init__(self, space: BaseSpace, vehicle_type='otter', num_envs=64, sample_time=0.1, max_steps=1000,
+                 start_radius=10, distance_weight=0.0, seed=None, current_field=None, **vehicle_arguments):
+        self.space = space
+        self.num_envs = num_envs
+        self.sample_time = sample_time
+        self.max_steps = max_steps
+        self.start_radius = start_radius
+        self.distance_weight = distance_weight
+        self.vehicles = [vs.create_instance(vehicle_type, serial_number=serial_number, **vehicle_arguments)
+                         for serial_number in range(num_envs)]
+        self.engine = SwarmEngine(self.vehicles, current_field)
+        self.action_low = np.full(self.engine.dimU, self.vehicles[0].n_min, float)
+        self.action_high = np.full(self.engine.dimU, self.vehicles[0].n_max, float)
+        self.heading = self.vehicles[0].heading_index
+        self.x_range = (space.x[0], space.x[-1])
+        self.y_range = (space.y[0], space.y[-1])
+
+        self.rng = np.random.default_rng(seed)
+        self.steps = np.zeros(num_envs, int)
+        self.f = np.zeros(num_envs, float)
+        self.f_dot = np.zeros(num_envs, float)
+
+    def __str__(self):
+        return (f'---environment---------------------------------------------------------------------\n'
+                f'Vectorized {self.vehicles[0].name} environment x{self.num_envs}\n'
+                f'Sampling time: {self.sample_time} seconds\n'
+                f'Episode length: {self.max_steps} steps')
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(np.ones(self.num_envs, bool))
+        return self._observation(), {}
+
+    def step(self, actions):
+        actions = np.clip(np.asarray(actions, float).reshape(self.num_envs, self.engine.dimU),
+                          self.action_low, self.action_high)
+        self.engine.step(actions, self.sample_time)
+        self.steps += 1
+
+        f = self._intensity()
+        self.f_dot = (f - self.f) / self.sample_time
+        self.f = f
+        observation = self._observation()
+
+        x, y = self.engine.eta[:, 1], self.engine.eta[:, 0]
+        reward = -np.abs(f)
+        if self.distance_weight:
+            reward -= self.distance_weight * self.space.get_nearest_contour_point_norm_batch(x, y)
+        terminated = ((x < self.x_range[0]) | (x > self.x_range[1]) |
+                      (y < self.y_range[0]) | (y > self.y_range[1]))
+        truncated = ~terminated & (self.steps >= self.max_steps)
+
+        info = {}
+        done = terminated | truncated
+        if np.any(done):
+            info["final_observation"] = observation[done]
+            info["done"] = done
+            self._reset_envs(done)
+            observation = self._observation()
+        return observation, reward, terminated, truncated, info
+
+    def _reset_envs(self, mask):
+        count = int(np.count_nonzero(mask))
+        angle = self.rng.uniform(0, 2 * np.pi, count)
+        radius = self.rng.uniform(0.1 * self.start_radius, self.start_radius, count)
+        eta = np.zeros((count, SwarmEngine.DOF))
+        eta[:, 0] = radius * np.sin(angle)
+        eta[:, 1] = radius * np.cos(angle)
+        eta[:, self.heading] = self.rng.uniform(-np.pi, np.pi, count)
+        self.engine.eta[mask] = eta
+        self.engine.nu[mask] = 0
+        self.engine.u_actual[mask] = 0
+        self.steps[mask] = 0
+        self.f[mask] = self.space.get_intensity(eta[:, 1], eta[:, 0])
+        self.f_dot[mask] = 0
+
+    def _intensity(self):
+        return self.space.get_intensity(self.engine.eta[:, 1], self.engine.eta[:, 0])
+
+    def _observation(self):
+        eta, nu = self.engine.eta, self.engine.nu
+        psi = eta[:, self.heading]
+        return np.column_stack((eta[:, 1], eta[:, 0], np.cos(psi), np.sin(psi),
+                                nu[:, 0], nu[:, 1], nu[:, self.heading], self.f, self.f_dot))
@@ -11,6 +11,7 @@ import controllers as cs
 
 from lib import *
 from tools import *
+from tools.backend import set_backend
 
 #("░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░\n"
 # "░░░░░░░░░░░░░░░░░▒▓▒▒░░▒▓▒░░░░░░░░░░░░░░░░░░░░░░░\n"
@@ -35,6 +36,39 @@ from tools import *
 # "░░░░░░░███░░░▒██▒░▓██░░░▒██░░░██▓░░░░░░▓██░░░░░░░\n"
 # "░░░░░░░░▓█████▓░░░░███▓░░▓███░░██████▒░▓██░░░░░░░\n"
 # "░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░\n")
+###############################################################################
+# Vehicle constructors
+###############################################################################
+# scenario parameters of the vehicles and of the controller
+VEHICLE_PARAMETERS = ('V_current', 'shift_vehicle', 'start_points')
+CONTROLLER_PARAMETERS = ('mu', 'f0')
+
+
+def create_vehicles(arguments, scenario=None):
+    scenario = scenario or {}
+    start_points = scenario.get('start_points', arguments.start_points)
+    if arguments.vehicles == 1:
+        starting_points = start_points[:1] if 'start_points' in scenario else [[0, 0]]
+    elif len(start_points) == arguments.vehicles:
+        starting_points = start_points
+    else:
+        starting_points = [next(point_generator(arguments.radius, arguments.vehicles)) for _ in range(arguments.vehicles)]
+    vehicles = []
+    ng = number_generator()
+    cg = color_generator()
+    for vehicle_name in arguments.vehicle_types:
+        for order_number in range(arguments.vehicles):
+            vehicles.append(vs.create_instance(vehicle_name,
+                                               V_current=scenario.get('V_current', arguments.V_current),
+                                               serial_number=next(ng),
+                                               shift=scenario.get('shift_vehicle', arguments.shift_vehicle),
+                                               color=next(cg),
+                                               starting_point=starting_points[order_number],
+                                               integrator=arguments.integrator,
+                                               dynamics_mode=arguments.dynamics_mode))
+    return vehicles
+
+
 ###############################################################################
 # Main simulation loop
 ###############################################################################
@@ -51,29 +85,19 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     arguments = read_and_assign_arguments(args.config_filename)
+    if arguments.resume_from and arguments.cycles > 1 and not arguments.ensemble:
+        # every cycle writes its own checkpoint, a single file can only continue one of them
+        raise ValueError("resume_from continues one run: use cycles = 1 or the ensemble mode, "
+                         "whose checkpoint holds all cycles")
+    print(f'Backend: {set_backend(arguments.backend)}')
 
-    ###############################################################################
-    # Vehicle constructors
-    ###############################################################################
-    if arguments.vehicles == 1:
-        starting_points = [[0, 0]]
-    elif len(arguments.start_points) == arguments.vehicles:
-        starting_points = arguments.start_points
-    else:
-        starting_points = [next(point_generator(arguments.radius, arguments.vehicles)) for _ in range(arguments.vehicles)]
-    vehicles = []
-    ng = number_generator()
-    cg = color_generator()
-    for vehicle_name in arguments.vehicle_types:
-        for order_number in range(arguments.vehicles):
-            vehicles.append(vs.create_instance(vehicle_name,
-                                               V_current=arguments.V_current,
-                                               serial_number=next(ng),
-                                               shift=arguments.shift_vehicle,
-                                               color=next(cg),
-                                               starting_point=starting_points[order_number]))
+    vehicles = create_vehicles(arguments)
     for vehicle in vehicles:
         print(vehicle)
+    if arguments.dynamics_mode == 'transition':
+        # error bounds of the mode models against the nonlinear dynamics
+        print('---transition model error--------------------------------------------------------')
+        print(vehicles[0].transition_model(arguments.sample_time))
 
     if arguments.clean_cache:
         clean_data()
@@ -86,10 +110,36 @@ if __name__ == '__main__':
                                shift_xyz=arguments.shift_xyz,
                                space_filename=arguments.peaks_filename,
                                target_isoline=arguments.target_isoline)
-    space.set_contour_points(tol=1)
+    space.set_contour_points(plane_z=arguments.target_isoline)
+    space.set_intensity_mode(arguments.intensity_mode)
     print(space)
+    if space.interp is not None:
+        error = space.interpolation_error()
+        print(f'Interpolation error: max {error["max"]:.3g}, rms {error["rms"]:.3g}')
+
+    current_field = create_current_field(arguments.current_field, space,
+                                         speed=arguments.V_current,
+                                         direction=arguments.beta_current)
+    if current_field is not None:
+        print(current_field)
 
+    stop_condition = None
+    if arguments.stop_hold_time > 0:
+        stop_condition = ConvergenceStop(hold_time=arguments.stop_hold_time,
+                                         distance_tol=arguments.stop_distance_tol,
+                                         rate_tol=arguments.stop_rate_tol)
+        print(stop_condition)
+
+    # per-cycle overrides of the vehicle and controller parameters
+    scenario_parameters = set(VEHICLE_PARAMETERS + CONTROLLER_PARAMETERS)
+    for scenario in arguments.scenarios:
+        if set(scenario) - scenario_parameters:
+            raise ValueError(f"Unknown scenario parameters: {sorted(set(scenario) - scenario_parameters)}, "
+                             f"expected some of {sorted(scenario_parameters)}")
+
+    controllers = []
     for i in range(arguments.cycles):
+        scenario = arguments.scenarios[i % len(arguments.scenarios)] if arguments.scenarios else {}
         data_storage = DataStorage(space.type, i)
 
         space.set_data_storage(data_storage)
@@ -97,17 +147,46 @@ if __name__ == '__main__':
                      store_plot=arguments.store_plot)
 
         controller = cs.create_instance(arguments.controller_type,
-                                        vehicles=vehicles,
+                                        # every scenario of an ensemble gets its own start points
+                                        vehicles=create_vehicles(arguments, scenario)
+                                        if arguments.ensemble or set(scenario) & set(VEHICLE_PARAMETERS)
+                                        else vehicles,
                                         sim_time=arguments.sim_time_sec,
                                         sample_time=arguments.sample_time,
                                         space=space,
                                         FPS=arguments.FPS,
-                                        isolines=arguments.isolines)
+                                        isolines=arguments.isolines,
+                                        control_time=arguments.control_time,
+                                        **{key: scenario[key] for key in CONTROLLER_PARAMETERS if key in scenario})
         controller.set_data_storage(data_storage)
+        controller.set_recording(record_every=arguments.record_every,
+                                 store_raw=arguments.store_raw)
+        if current_field is not None:
+            # the grid is stored with the results and can be reused as current_field
+            current_field.store(data_storage.get_path('current_field', 'npz'))
         print(controller)
         print(data_storage)
+        controllers.append(controller)
+
+    checkpoint_every = round(arguments.checkpoint_every_sec / arguments.sample_time)
+    if arguments.ensemble:
+        # all cycles are simulated in lockstep
+        ensembleData = ensemble_simulate(controllers,
+                                         stop_condition=stop_condition,
+                                         checkpoint_every=checkpoint_every,
+                                         resume_from=arguments.resume_from,
+                                         profiler=Profiler() if arguments.profile else None,
+                                         current_field=current_field)
+    else:
+        ensembleData = (simultaneous_simulate(controller=controller,
+                                              stop_condition=stop_condition,
+                                              checkpoint_every=checkpoint_every,
+                                              resume_from=arguments.resume_from,
+                                              profiler=Profiler() if arguments.profile else None,
+                                              current_field=current_field)
+                        for controller in controllers)
 
-        swarmData = simultaneous_simulate(controller=controller)
+    for controller, swarmData in zip(controllers, ensembleData):
         plotting_all(controller,
                      separating_plots=arguments.separating_plots,
                      not_animated=arguments.not_animated,
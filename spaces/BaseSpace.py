@@ -1,9 +1,13 @@
+import warnings
 import numpy as np
 import matplotlib.pyplot as plt
 
 from abc import ABC
 from tools.dataStorage import *
 from collections.abc import Sequence
+from tools.backend import use_jit
+from scipy.interpolate import RectBivariateSpline
+from scipy.spatial import cKDTree
 
 
 class Peak:
@@ -53,8 +57,97 @@ class ShiftingSpace:
         return self.shift_xyz[2]
 
 
+# Cell edges crossed by the isoline for the 16 marching-squares cases, the corner
+# bits are 1 bottom-left, 2 bottom-right, 4 top-right, 8 top-left and the edges
+# B bottom, R right, T top, L left. The saddles 5 and 10 are resolved by the
+# value at the cell centre, see marching_squares().
+MARCHING_SQUARES_SEGMENTS = {
+    1: ('LB',), 2: ('BR',), 3: ('LR',), 4: ('RT',), 6: ('BT',), 7: ('LT',), 8: ('TL',), 9: ('BT',),
+    11: ('RT',), 12: ('LR',), 13: ('BR',), 14: ('LB',),
+    # saddles: (centre below, centre above)
+    5: (('LB', 'RT'), ('BR', 'TL')), 10: (('BR', 'TL'), ('LB', 'RT')),
+}
+
+
+def marching_squares(x, y, Z, level):
+    """
+    Isolines Z = level of the surface Z[i, j] over the grid (x[j], y[i]).
+
+    The cells are classified and the crossings are linearly interpolated on the
+    cell edges with array operations; the segments are then chained through the
+    shared edges into polylines.
+
+    Returns:
+    list: (k, 2) arrays of ordered [x, y] points, closed lines repeat their first point.
+    """
+    x, y = np.asarray(x, float), np.asarray(y, float)
+    values = np.asarray(Z, float) - level
+    ny, nx = values.shape
+    above = values > 0
+    case = (above[:-1, :-1] * 1 + above[:-1, 1:] * 2 + above[1:, 1:] * 4 + above[1:, :-1] * 8)
+    centre_above = (values[:-1, :-1] + values[:-1, 1:] + values[1:, 1:] + values[1:, :-1]) > 0
+
+    # ids of the cell edges: horizontal edges first, then the vertical ones
+    horizontal = ny * (nx - 1)
+    def edge_ids(edge, i, j):
+        return {'B': i * (nx - 1) + j, 'T': (i + 1) * (nx - 1) + j,
+                'L': horizontal + i * nx + j, 'R': horizontal + i * nx + j + 1}[edge]
+
+    starts, ends = [], []
+    for cell_case, segments in MARCHING_SQUARES_SEGMENTS.items():
+        if cell_case in (5, 10):
+            variants = ((segments[0], ~centre_above), (segments[1], centre_above))
+        else:
+            variants = ((segments, True),)
+        for pairs, selected in variants:
+            i, j = np.nonzero((case == cell_case) & selected)
+            for pair in pairs:
+                starts.append(edge_ids(pair[0], i, j))
+                ends.append(edge_ids(pair[1], i, j))
+    if not starts:
+        return []
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+
+    # crossing points of the edges, interpolated between the edge vertices
+    nodes = np.unique(np.concatenate((starts, ends)))
+    is_horizontal = nodes < horizontal
+    i0 = np.where(is_horizontal, nodes // (nx - 1), (nodes - horizontal) // nx)
+    j0 = np.where(is_horizontal, nodes % (nx - 1), (nodes - horizontal) % nx)
+    i1, j1 = i0 + ~is_horizontal, j0 + is_horizontal
+    t = values[i0, j0] / (values[i0, j0] - values[i1, j1])
+    points = np.column_stack((x[j0] + t * (x[j1] - x[j0]), y[i0] + t * (y[i1] - y[i0])))
+
+    # every crossing belongs to at most two segments
+    neighbours = {}
+    for start, end in zip(np.searchsorted(nodes, starts).tolist(), np.searchsorted(nodes, ends).tolist()):
+        neighbours.setdefault(start, []).append(end)
+        neighbours.setdefault(end, []).append(start)
+    lines = []
+    visited = set()
+    open_ends = [node for node, linked in neighbours.items() if len(linked) == 1]
+    for first in open_ends + list(neighbours):
+        if first in visited:
+            continue
+        line = [first]
+        visited.add(first)
+        node = first
+        while True:
+            following = [linked for linked in neighbours[node] if linked not in visited]
+            if not following:
+                break
+            node = following[0]
+            visited.add(node)
+            line.append(node)
+        if len(line) > 2 and first in neighbours[node]:
+            line.append(first)
+        lines.append(points[line])
+    return lines
+
+
 class BaseSpace(ABC):
     name = 'base_space'
+    intensity_kernel = None  # jit kernel of analytic_intensity() for the 'numba' backend
+    intensity_modes = {'analytic': None, 'bilinear': 1, 'bicubic': 3}  # spline degrees
 
     def __init__(self, x_range=(-30, 30), y_range=(-30, 30), grid_size=500, shift_xyz=None, space_filename="",
                  target_isoline=0):
@@ -72,13 +165,23 @@ class BaseSpace(ABC):
         self.X, self.Y = np.meshgrid(self.x, self.y)
         self.Z = np.zeros_like(self.X)  # Start with a flat surface
         self.shift_xyz = ShiftingSpace(shift_xyz)
-        self.interp = None
+        self.interp = None  # spline over the grid of the interpolated intensity modes
+        self.intensity_mode = 'analytic'
         self.contour_points = list()
+        self.contour_lines = list()
+        self.contour_array = np.empty((0, 2))
+        self.contour_tree = cKDTree(self.contour_array)
         self.peaks = list()
         if space_filename:
             with open(space_filename, 'r') as file:
                 data = json.load(file)
                 self.peaks = [Peak(**item) for item in data]
+        # [x0, y0, amplitude, sigma_x, sigma_y] rows for the intensity kernels
+        self.peak_array = np.array([[peak.x0, peak.y0, peak.amplitude, peak.sigma_x, peak.sigma_y]
+                                    for peak in self.peaks], float).reshape(-1, 5)
+        # peak centres in the shifted space and the 1/(2 sigma^2) scales of the batched queries
+        self.peak_centers = self.peak_array[:, 0:2] + [self.shift_xyz.shift_x(), self.shift_xyz.shift_y()]
+        self.peak_scales = 0.5 / self.peak_array[:, 3:5] ** 2
         self.type = ""
         self.target_isoline = target_isoline
         self.grid_size = grid_size
@@ -88,21 +191,136 @@ class BaseSpace(ABC):
         return (f'---space--------------------------------------------------------------------\n'
                 f'Space type: {self.type}\n'
                 f'Shifting space: {self.shift_xyz}\n'
-                f'Target isoline: {self.target_isoline}')
+                f'Target isoline: {self.target_isoline}\n'
+                f'Intensity: {self.intensity_mode}')
 
-    def set_contour_points(self, plane_z=0, tol=1e-8):
-        cont = []
-        for i in range(len(self.X)):
-            for j in range(len(self.X[i])):
-                if abs(self.Z[i, j] - plane_z) < tol:
-                    cont.append((self.X[i, j], self.Y[i, j]))
-        self.contour_points = cont
+    def set_contour_points(self, plane_z=0, tol=None):
+        """
+        Extracts the isolines Z = plane_z with marching squares, contour_lines keeps
+        the ordered polylines and contour_array all their points. tol is deprecated
+        and ignored, the isolines no longer depend on a tolerance.
+        """
+        if tol is not None:
+            warnings.warn("set_contour_points(tol=...) is deprecated and ignored, the isolines are extracted "
+                          "with marching squares", DeprecationWarning, stacklevel=2)
+        self.contour_lines = marching_squares(self.x, self.y, self.Z, plane_z)
+        self.contour_array = np.concatenate(self.contour_lines + [np.empty((0, 2))])
+        self.contour_points = [tuple(point) for point in self.contour_array.tolist()]
+        self.contour_tree = cKDTree(self.contour_array)
+
+    def get_nearest_contour_points(self, xs, ys):
+        """
+        Nearest contour points of the points (xs, ys), one KD-tree query for all
+        of them.
+
+        Returns:
+        tuple: The distances, the nearest contour points (..., 2) and their
+            indices in contour_array. Without contour points the distances are
+            inf and the indices len(contour_array).
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs, float), np.asarray(ys, float))
+        distances, indices = self.contour_tree.query(np.stack((xs, ys), axis=-1))
+        points = np.vstack((self.contour_array, np.full((1, 2), np.nan)))[indices]
+        return distances, points, indices
 
     def get_nearest_contour_point_norm(self, x, y):
-        return min([(xc - x) ** 2 + (yc - y) ** 2 for xc, yc in self.contour_points]) ** 0.5
+        return self.get_nearest_contour_points(x, y)[0]
+
+    def get_nearest_contour_point_norm_batch(self, xs, ys):
+        """
+        Distances from the points (xs, ys) to the nearest contour points.
+        """
+        return self.get_nearest_contour_points(xs, ys)[0]
+
+    def peak_profile(self, amplitude, r2):
+        """
+        Intensity of peaks with the given amplitudes at the scaled squared
+        distances r2 = dx^2 / (2 sigma_x^2) + dy^2 / (2 sigma_y^2).
+        """
+        raise NotImplementedError
+
+    def intensity_grid(self):
+        """
+        The intensity on the grid relative to the target isoline, the samples
+        of the interpolated intensity modes.
+        """
+        return self.Z - self.target_isoline
+
+    def set_intensity_mode(self, mode='analytic'):
+        """
+        Selects how get_intensity() is evaluated: 'analytic' sums all peaks,
+        'bilinear' and 'bicubic' interpolate intensity_grid() at a cost that does
+        not depend on the number of peaks. Points outside the grid are evaluated
+        analytically.
+        """
+        if mode not in self.intensity_modes:
+            raise ValueError(f"Unknown intensity mode: {mode}, expected one of {tuple(self.intensity_modes)}")
+        degree = self.intensity_modes[mode]
+        self.intensity_mode = mode
+        self.interp = None
+        if degree is not None:
+            self.interp = RectBivariateSpline(self.y, self.x, self.intensity_grid(), kx=degree, ky=degree)
+
+    def interpolation_error(self, samples=10000, seed=0) -> dict:
+        """
+        Returns the largest and the root mean square difference between the
+        interpolated and the analytic intensity at random points of the grid.
+        """
+        if self.interp is None:
+            return {"max": 0.0, "rms": 0.0}
+        rng = np.random.default_rng(seed)
+        x = rng.uniform(self.x[0], self.x[-1], samples)
+        y = rng.uniform(self.y[0], self.y[-1], samples)
+        error = self.get_intensity(x, y) - self.analytic_intensity(x, y)
+        return {"max": float(np.max(np.abs(error))), "rms": float(np.sqrt(np.mean(error ** 2)))}
 
     def get_intensity(self, x_current, y_current):
-        pass
+        """
+        Get the intensity relative to the target isoline at the points (x, y).
+
+        Parameters:
+        x_current, y_current (float or array): The coordinates, e.g. the positions
+            of all vehicles or a whole trajectory, broadcast against each other.
+
+        Returns:
+        float or array: The intensities at the specified points.
+        """
+        if self.interp is None:
+            return self.analytic_intensity(x_current, y_current)
+        x_current, y_current = np.broadcast_arrays(np.asarray(x_current, float), np.asarray(y_current, float))
+        intensity = self.interp.ev(y_current, x_current)
+        outside = ((x_current < self.x[0]) | (x_current > self.x[-1]) |
+                   (y_current < self.y[0]) | (y_current > self.y[-1]))
+        if np.any(outside):
+            intensity[outside] = self.analytic_intensity(x_current[outside], y_current[outside])
+        return intensity[()]
+
+    def analytic_intensity(self, x_current, y_current, chunk_size=2 ** 22):
+        """
+        The sum of all peaks relative to the target isoline at the points (x, y).
+
+        Parameters:
+        x_current, y_current (float or array): The coordinates, broadcast against
+            each other.
+        chunk_size (int): At most chunk_size point-peak pairs are evaluated at once.
+
+        Returns:
+        float or array: The intensities at the specified points.
+        """
+        if use_jit() and np.ndim(x_current) == 0 and np.ndim(y_current) == 0:
+            return self.intensity_kernel(x_current, y_current, self.peak_array, self.shift_xyz.shift_x(),
+                                         self.shift_xyz.shift_y()) - self.target_isoline
+        x_current, y_current = np.broadcast_arrays(np.asarray(x_current, float), np.asarray(y_current, float))
+        points = np.column_stack((x_current.ravel(), y_current.ravel()))
+        intensity = np.empty(len(points))
+        amplitude = self.peak_array[:, 2]
+        rows = max(1, chunk_size // max(1, len(self.peak_array)))
+        for start in range(0, len(points), rows):
+            difference = points[start:start + rows, None, :] - self.peak_centers
+            r2 = np.einsum('ijk,jk->ij', difference * difference, self.peak_scales)
+            intensity[start:start + rows] = self.peak_profile(amplitude, r2).sum(axis=1)
+        intensity -= self.target_isoline
+        return intensity.reshape(x_current.shape)[()]
 
     def plotting_surface(self, store_plot=False, **arguments):
         """
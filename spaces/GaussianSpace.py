@@ -1,10 +1,60 @@
+import math
 import numpy as np
 from spaces import BaseSpace
+from tools.backend import jit
+
+
+@jit
+def gaussian_intensity_kernel(x, y, peaks, shift_x, shift_y):
+    """
+    Sum of the Gaussian peaks at (x, y), the rows of peaks are
+    [x0, y0, amplitude, sigma_x, sigma_y]; analytic_intensity() of the 'numba' backend.
+    """
+    intensity = 0.0
+    for k in range(peaks.shape[0]):
+        dx = x - peaks[k, 0] - shift_x
+        dy = y - peaks[k, 1] - shift_y
+        intensity += peaks[k, 2] * math.exp(-(dx ** 2 / (2 * peaks[k, 3] ** 2) + dy ** 2 / (2 * peaks[k, 4] ** 2)))
+    return intensity
+
+
+def gaussian_grid(x, y, centers, scales, amplitudes, truncate=None, chunk_size=64):
+    """
+    Sum of axis-aligned Gaussian peaks over the grid (x[j], y[i]). A peak is the
+    outer product of its 1-D profiles exp(-(y - y0)^2 / (2 sigma_y^2)) and
+    exp(-(x - x0)^2 / (2 sigma_x^2)), so chunk_size peaks at a time are summed
+    with one matrix product of the stacked profiles. With truncate = k every peak
+    is added only on the grid window within k sigma of its centre.
+
+    Parameters:
+    x, y (array): The grid axes.
+    centers (array): (n, 2) peak centres [x0, y0].
+    scales (array): (n, 2) factors 1 / (2 sigma^2) in x and y.
+    amplitudes (array): (n,) peak heights.
+    """
+    Z = np.zeros((len(y), len(x)))
+    if truncate is None:
+        for start in range(0, len(amplitudes), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            profile_x = np.exp(-(x - centers[chunk, 0:1]) ** 2 * scales[chunk, 0:1])
+            profile_y = np.exp(-(y - centers[chunk, 1:2]) ** 2 * scales[chunk, 1:2])
+            Z += (amplitudes[chunk, None] * profile_y).T @ profile_x
+        return Z
+    half_width = truncate / np.sqrt(2 * scales)  # k sigma
+    for (x0, y0), (ax, ay), amplitude, (wx, wy) in zip(centers, scales, amplitudes, half_width):
+        columns = slice(np.searchsorted(x, x0 - wx), np.searchsorted(x, x0 + wx, side='right'))
+        rows = slice(np.searchsorted(y, y0 - wy), np.searchsorted(y, y0 + wy, side='right'))
+        profile_x = np.exp(-(x[columns] - x0) ** 2 * ax)
+        profile_y = amplitude * np.exp(-(y[rows] - y0) ** 2 * ay)
+        Z[rows, columns] += np.multiply.outer(profile_y, profile_x)
+    return Z
 
 
 class Gaussian3DSpace(BaseSpace):
     name = 'gaussian'
-    def __init__(self, x_range=(-50, 50), y_range=(-50, 50), grid_size=500, shift_xyz=None, space_filename="", target_isoline=0):
+    intensity_kernel = staticmethod(gaussian_intensity_kernel)
+    def __init__(self, x_range=(-50, 50), y_range=(-50, 50), grid_size=500, shift_xyz=None, space_filename="", target_isoline=0,
+                 truncate=None):
         """
         Initialize the 3D Gaussian space.
 
@@ -13,35 +63,12 @@ class Gaussian3DSpace(BaseSpace):
         y_range (tuple): Range of y-axis values.
         grid_size (int): Number of points in each dimension.
         shift_xyz (int): Shift of all points of space by values from this array, respectively XYZ.
+        truncate (float): Peaks are added to Z only within truncate sigma of their centres, None adds them everywhere.
         """
         super().__init__(x_range, y_range, grid_size, shift_xyz, space_filename, target_isoline)
-        """
-            Add a Gaussian peak to the Z surface.
-
-            Parameters:
-            x0, y0 (float): Center of the Gaussian peak.
-            amplitude (float): Height of the Gaussian peak.
-            sigma_x, sigma_y (float): Spread of the Gaussian in x and y directions.
-        """
-        for peak in self.peaks:
-            self.Z += peak.amplitude * np.exp(-((self.X - peak.x0 - self.shift_xyz.shift_x()) ** 2 / (2 * peak.sigma_x ** 2) +
-                                                (self.Y - peak.y0 - self.shift_xyz.shift_y()) ** 2 / (2 * peak.sigma_y ** 2)))
+        self.Z += gaussian_grid(self.x, self.y, self.peak_centers, self.peak_scales, self.peak_array[:, 2], truncate)
         # self.Z += self.shift_xyz.shift_z()
         self.type = "gaussian"
 
-    def get_intensity(self, x_current, y_current):
-        """
-        Get the Z value at a specific (x, y) point.
-
-        Parameters:
-        x_current, y_current (float): The x and y coordinates for which to get the Z value.
-
-        Returns:
-        float: The Z value at the specified (x, y) point.
-        """
-        intensity: float = 0
-        for peak in self.peaks:
-            intensity += peak.amplitude * np.exp(-((x_current - peak.x0 - self.shift_xyz.shift_x()) ** 2 / (2 * peak.sigma_x ** 2) +
-                                    (y_current - peak.y0 - self.shift_xyz.shift_y()) ** 2 / (2 * peak.sigma_y ** 2)))
-        intensity -= self.target_isoline
-        return intensity
+    def peak_profile(self, amplitude, r2):
+        return amplitude * np.exp(-r2)
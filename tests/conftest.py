@@ -0,0 +1,34 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import spaces as sp
+import vehicles as vs
+import controllers as cs
+
+
+@pytest.fixture
+def space():
+    space = sp.create_instance('gaussian', x_range=(-15, 15), y_range=(-15, 15), grid_size=100, shift_xyz=[0, 0, 0],
+                               space_filename=os.path.join(ROOT, 'peaks_.json'), target_isoline=10)
+    space.set_contour_points(plane_z=space.target_isoline)
+    return space
+
+
+@pytest.fixture
+def make_controller(space):
+    """
+    Builds a fresh intensity controller over fresh vehicles on every call, so
+    several runs of the same scenario can be compared.
+    """
+    def make(vehicle_types=('otter', 'dubins'), sim_time=2, sample_time=0.02, V_current=0.1, **arguments):
+        starting_points = [[-10, 0], [-8, 1]]
+        vehicles = [vs.create_instance(vehicle_type, V_current=V_current, serial_number=number, shift=[-4, 0],
+                                       color='b', starting_point=starting_points[number % 2])
+                    for number, vehicle_type in enumerate(vehicle_types)]
+        return cs.create_instance('intensity', vehicles=vehicles, sim_time=sim_time, sample_time=sample_time,
+                                  space=space, **arguments)
+    return make
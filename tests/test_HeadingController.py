@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import vehicles as vs
+import controllers as cs
+from lib import simultaneous_simulate
+
+
+def make_heading(space, psi_ref, sim_time=40):
+    vehicles = [vs.create_instance('otter', V_current=0.0, serial_number=number, shift=[0, 0], color='b',
+                                   starting_point=[number, 0]) for number in range(len(psi_ref))]
+    return cs.create_instance('heading', vehicles=vehicles, sim_time=sim_time, sample_time=0.02, space=space,
+                              psi_ref=psi_ref)
+
+
+def test_heading_controller_reaches_the_reference(space):
+    psi_ref = [30, -45, 90]
+    table = simultaneous_simulate(make_heading(space, psi_ref))
+
+    # heading psi and yaw rate r of the last step
+    np.testing.assert_allclose(np.degrees(table[:, -1, 5]), psi_ref, atol=1)
+    np.testing.assert_allclose(table[:, -1, 11], 0, atol=1e-3)
+
+
+def test_heading_controller_uses_the_measured_yaw_rate(space):
+    controller = make_heading(space, [0, 0], sim_time=1)
+    eta = np.zeros((2, 6))
+    nu = np.zeros((2, 6))
+    nu[1, 5] = 0.5
+    controls = np.asarray(controller.generate_control(eta, 0, nu))
+
+    # the vessel at rest keeps its course, the one turning to starboard gets a
+    # moment to port from the faster right propeller
+    assert controls[0, 0] == controls[0, 1]
+    assert controls[1, 0] < controls[1, 1]
+    with pytest.raises(ValueError):
+        controller.generate_control(eta, 1)
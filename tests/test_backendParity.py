@@ -0,0 +1,26 @@
+import os
+import pytest
+import spaces as sp
+import tools.backend as backend
+from lib.backendParity import kernel_parity, backend_parity
+from conftest import ROOT
+
+
+def test_kernel_parity(space):
+    parabolic = sp.create_instance('parabolic', x_range=(-15, 15), y_range=(-15, 15), grid_size=100,
+                                   shift_xyz=[0, 0, 0], space_filename=os.path.join(ROOT, 'peaks_.json'),
+                                   target_isoline=10)
+    errors = kernel_parity([space, parabolic], samples=200)
+
+    assert {'attitudeEuler', 'crossFlowDrag', 'otter', 'dubins', 'berman_law', 'gaussian_intensity',
+            'parabolic_intensity'} <= set(errors)
+    for kernel, error in errors.items():
+        assert error < 1e-9, kernel
+
+
+@pytest.mark.skipif(backend.numba is None, reason="numba is not installed")
+@pytest.mark.parametrize('vehicle_types', [('otter', 'dubins'), ('otter3dof', 'otter')])
+def test_backend_parity(make_controller, vehicle_types):
+    # the full recorded tables (positions, velocities, controls) of both backends
+    assert backend_parity(lambda: make_controller(vehicle_types=vehicle_types, sim_time=5)) < 1e-6
+
@@ -0,0 +1,17 @@
+import numpy as np
+from lib import simultaneous_simulate, ConvergenceStop, AnyOf
+
+
+def test_resumed_run_stops_at_the_same_step(make_controller, tmp_path):
+    # every step is inside the tolerances, the run stops after hold_time seconds
+    def stop_condition():
+        return AnyOf(ConvergenceStop(hold_time=2.0, distance_tol=1e3, rate_tol=1e3, check_time=0.1))
+
+    path = str(tmp_path / 'checkpoint.npz')
+    table = simultaneous_simulate(make_controller(sim_time=5), stop_condition(), checkpoint_every=50,
+                                  checkpoint_path=path)
+    resumed = simultaneous_simulate(make_controller(sim_time=5), stop_condition(), resume_from=path)
+
+    assert table.shape[1] < 5 / 0.02
+    assert resumed.shape == table.shape
+    np.testing.assert_allclose(resumed, table)
@@ -0,0 +1,19 @@
+import warnings
+import numpy as np
+import pytest
+from lib.gnc import crossFlowDrag, crossFlowKernel, crossFlowStrips
+
+
+@pytest.mark.parametrize('r', [1e-310, -1e-310, 1e-12, -1e-12])
+def test_cross_flow_drag_of_a_tiny_yaw_rate(r):
+    nu_r = np.array([0, 0.1, 0, 0, 0, r])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        scalar = crossFlowDrag(2.0, 0.3, 0.2, nu_r)
+        batch = crossFlowDrag(2.0, 0.3, 0.2, nu_r[None])[0]
+        kernel = crossFlowKernel(*crossFlowStrips(2.0, 0.3, 0.2), 0.1, r)
+    straight = crossFlowDrag(2.0, 0.3, 0.2, np.array([0, 0.1, 0, 0, 0, 0.0]))
+
+    np.testing.assert_allclose(scalar, straight, atol=1e-9)
+    np.testing.assert_allclose(batch, scalar)
+    np.testing.assert_allclose(kernel, scalar[[1, 5]])
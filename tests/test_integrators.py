@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from lib.integrators import create_integrator
+
+
+class Diverging:
+    """Vehicle stub whose derivatives are noise of the given magnitude."""
+    name = 'diverging'
+
+    def __init__(self, magnitude):
+        self.magnitude = magnitude
+        self.rng = np.random.default_rng(0)
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        return self.magnitude * self.rng.standard_normal((2,) + eta.shape)
+
+    def actuators_batch(self, eta, nu, u_actual, u_control):
+        return nu, u_actual
+
+
+@pytest.mark.parametrize('magnitude, message', [(np.nan, 'not finite'), (1e20, 'fell below')])
+def test_rk45_stops_on_a_diverging_state(magnitude, message):
+    integrator = create_integrator('rk45')
+    eta, nu, u = np.zeros((2, 6)), np.zeros((2, 6)), np.zeros((2, 2))
+
+    with pytest.raises(RuntimeError, match=message):
+        integrator.step(Diverging(magnitude), eta, nu, u, u, 0.02)
+
+
+class Decaying(Diverging):
+    """Vehicle stub with the velocities decaying as exp(-t)."""
+    name = 'decaying'
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        return nu, -nu
+
+
+def test_rk45_follows_a_smooth_solution():
+    integrator = create_integrator('rk45')
+    eta, nu, u = np.zeros((1, 6)), np.ones((1, 6)), np.zeros((1, 2))
+    eta, nu, u = integrator.step(Decaying(0), eta, nu, u, u, 0.5)
+
+    np.testing.assert_allclose(nu, np.exp(-0.5), rtol=1e-5)
+    np.testing.assert_allclose(eta, 1 - np.exp(-0.5), rtol=1e-5)
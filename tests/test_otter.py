@@ -0,0 +1,41 @@
+import numpy as np
+from vehicles import Otter
+from lib.gnc import attitudeEulerBatch
+
+
+def test_transition_model_within_tolerance():
+    model = Otter(dynamics_mode='transition').transition_model(0.02)
+    velocity_tol, position_tol = Otter.transition_tolerance
+
+    assert len(model.errors) == len(model.inputs)
+    assert model.enabled.all(), str(model)
+    for error in model.errors.values():
+        assert error["velocity"] <= velocity_tol and error["position"] <= position_tol
+
+
+def test_transition_dynamics_follow_switching_inputs():
+    sample_time, steps, n = 0.02, 1500, 10
+    standard, transition = Otter(), Otter(dynamics_mode='transition')
+    U = standard.mode_inputs()
+    rng = np.random.default_rng(0)
+    # every vessel holds a random input for 0.5 to 3 seconds
+    modes = np.zeros((steps, n), int)
+    for vessel in range(n):
+        step = 0
+        while step < steps:
+            hold = rng.integers(25, 150)
+            modes[step:step + hold, vessel] = rng.integers(0, len(U))
+            step += hold
+    current = np.column_stack((np.full(n, 0.2), np.full(n, 0.5)))
+
+    eta, nu, u_actual = np.zeros((n, 6)), np.zeros((n, 6)), np.zeros((n, 2))
+    eta_model, nu_model, u_model = eta.copy(), nu.copy(), u_actual.copy()
+    for step in range(steps):
+        u_control = U[modes[step]]
+        nu, u_actual = standard.dynamics_batch(eta, nu, u_actual, u_control, sample_time, current)
+        eta = attitudeEulerBatch(eta, nu, sample_time)
+        nu_model, u_model = transition.dynamics_batch(eta_model, nu_model, u_model, u_control, sample_time, current)
+        eta_model = attitudeEulerBatch(eta_model, nu_model, sample_time)
+
+    assert np.max(np.abs(nu_model - nu)) < 0.05
+    assert np.max(np.hypot(*(eta_model - eta)[:, 0:2].T)) < 0.5
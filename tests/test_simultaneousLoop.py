@@ -0,0 +1,21 @@
+import numpy as np
+from lib import simultaneous_simulate, simulate_steps, CurrentField
+
+
+def test_simulate_steps_matches_simultaneous_simulate(make_controller):
+    table = simultaneous_simulate(make_controller())
+    # the views are overwritten by the next step
+    steps = [(view.step, view.eta.copy()) for view in simulate_steps(make_controller(), every=10)]
+
+    assert steps[-1][0] == table.shape[1] - 1
+    # the state after step i is the row i + 1 of the table
+    for step, eta in steps[:-1]:
+        np.testing.assert_allclose(eta, table[:, step + 1, 0:6])
+
+
+def test_simulate_steps_with_current_field(make_controller):
+    field = CurrentField.uniform(0.3, 45.0, (-20, 20), (-20, 20))
+    table = simultaneous_simulate(make_controller(), current_field=field)
+    eta = [view.eta.copy() for view in simulate_steps(make_controller(), current_field=field)]
+
+    np.testing.assert_allclose(eta[-2], table[:, -1, 0:6])
@@ -0,0 +1,10 @@
+import numpy as np
+import pytest
+
+
+def test_set_contour_points_accepts_the_deprecated_tol(space):
+    contour = space.contour_array.copy()
+    with pytest.warns(DeprecationWarning):
+        space.set_contour_points(plane_z=space.target_isoline, tol=1)
+
+    np.testing.assert_array_equal(space.contour_array, contour)
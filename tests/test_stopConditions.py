@@ -0,0 +1,10 @@
+import pytest
+from lib import ConvergenceStop
+
+
+def test_convergence_stop_rejects_a_window_shorter_than_the_recording(make_controller):
+    controller = make_controller()
+    controller.set_recording(record_every=10)
+
+    with pytest.raises(ValueError, match="hold_time"):
+        ConvergenceStop(hold_time=0.3).reset(controller)
@@ -0,0 +1,44 @@
+import pytest
+import vehicles as vs
+from lib import simultaneous_simulate, Profiler, StopCondition
+
+
+@pytest.mark.parametrize('vehicle_type', ['otter', 'otter3dof', 'dubins'])
+def test_vehicles_have_no_instance_dict(vehicle_type):
+    vehicle = vs.create_instance(vehicle_type, V_current=0.1, serial_number=0, shift=[0, 0], color='b',
+                                 starting_point=[0, 0])
+
+    assert not hasattr(vehicle, '__dict__')
+    with pytest.raises(AttributeError):
+        vehicle.unknown = 1
+
+
+def test_profiler_times_and_releases_the_vehicle_classes(make_controller):
+    controller = make_controller(vehicle_types=('otter', 'otter3dof', 'dubins'))
+    methods = {(type(v), method): type(v).__dict__.get(method) for v in controller.vehicles
+               for method in ('dynamics_batch', 'derivatives_batch', 'repositioning_batch')}
+    profiler = Profiler()
+    simultaneous_simulate(controller, profiler=profiler)
+
+    assert profiler.calls['dynamics'] > 0 and profiler.calls['repositioning'] > 0
+    assert profiler.calls['get_intensity'] > 0
+    assert not profiler.instrumented
+    for (cls, method), own in methods.items():
+        assert cls.__dict__.get(method) is own
+
+
+def test_profiler_releases_the_classes_when_the_loop_fails(make_controller):
+    class Failing(StopCondition):
+        def __call__(self, controller, step):
+            raise RuntimeError("interrupted")
+
+    controller = make_controller()
+    methods = {(type(v), method): type(v).__dict__.get(method) for v in controller.vehicles
+               for method in ('dynamics_batch', 'derivatives_batch', 'repositioning_batch')}
+    profiler = Profiler()
+    with pytest.raises(RuntimeError, match="interrupted"):
+        simultaneous_simulate(controller, Failing(), profiler=profiler)
+
+    assert not profiler.instrumented
+    for (cls, method), own in methods.items():
+        assert cls.__dict__.get(method) is own
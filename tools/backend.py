@@ -0,0 +1,46 @@
+"""
+Optional JIT compilation of the innermost numerical kernels.
+
+The kernels (vehicle dynamics, attitude integration, peak intensities, the
+Berman law) are plain Python functions on floats and arrays decorated with
+jit(). With numba installed jit() compiles them with numba.njit and the models
+call them while the 'numba' backend is selected. Without numba jit() leaves the
+functions as they are, the 'numba' backend falls back to 'numpy' and the
+models keep their NumPy code.
+"""
+try:
+    import numba
+except ImportError:
+    numba = None
+
+backends = ('numpy', 'numba')
+active_backend = 'numpy'
+
+
+def jit(function):
+    """
+    Compiles a kernel with numba.njit when numba is installed, the compilation
+    happens on the first call and is cached on disk.
+    """
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+def set_backend(name) -> str:
+    """
+    Selects the backend of the kernels and returns the one in use, 'numba'
+    falls back to 'numpy' when numba is not installed.
+    """
+    global active_backend
+    if name not in backends:
+        raise ValueError(f"Unknown backend: {name}, expected one of {backends}")
+    if name == 'numba' and numba is None:
+        print("numba is not installed, the 'numpy' backend is used")
+        name = 'numpy'
+    active_backend = name
+    return active_backend
+
+
+def use_jit() -> bool:
+    return active_backend == 'numba'
@@ -2,6 +2,7 @@ import os
 import datetime
 import shutil
 import json
+import numpy as np
 
 
 def create_timestamped_suffix() -> str:
@@ -94,6 +95,13 @@ class DataStorage:
                                                             self.timestamped_suffix,
                                                             expansion))
 
+    def open_array(self, name, shape, dtype=float) -> np.memmap:
+        """
+        Creates a .npy file in the result folder and maps it into memory, so large
+        recordings are written to disk page by page instead of being kept in RAM.
+        """
+        return np.lib.format.open_memmap(self.get_path(name, 'npy'), mode='w+', dtype=dtype, shape=shape)
+
 
 class Arguments:
     def __init__(self, **arguments):
@@ -128,7 +136,22 @@ class Arguments:
                     "grid_size": self.grid_size,
                     "FPS": self.FPS,
                     "V_current": self.V_current,
-                    "beta_current": self.beta_current
+                    "beta_current": self.beta_current,
+                    "ensemble": self.ensemble,
+                    "scenarios": self.scenarios,
+                    "integrator": self.integrator,
+                    "stop_hold_time": self.stop_hold_time,
+                    "stop_distance_tol": self.stop_distance_tol,
+                    "stop_rate_tol": self.stop_rate_tol,
+                    "checkpoint_every_sec": self.checkpoint_every_sec,
+                    "resume_from": self.resume_from,
+                    "control_time": self.control_time,
+                    "record_every": self.record_every,
+                    "profile": self.profile,
+                    "dynamics_mode": self.dynamics_mode,
+                    "current_field": self.current_field,
+                    "backend": self.backend,
+                    "intensity_mode": self.intensity_mode
                 }
 
     # Save the variables to a new JSON file
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from .vehicle import Vehicle
 from .otter import Otter
+from .otter3dof import Otter3DOF
 from .dubins import Dubins
 
 vehicle_instance = {}
@@ -18,4 +19,5 @@ def create_instance(class_name: str, **arguments) -> Vehicle:
         raise ValueError(f"Unknown class name: {class_name}")
 
 register_class(Otter)
+register_class(Otter3DOF)
 register_class(Dubins)
\ No newline at end of file
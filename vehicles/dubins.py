@@ -7,6 +7,22 @@ dubins.py:
 import math
 from .vehicle import *
 from tools.random_generators import *
+from tools.backend import jit, use_jit
+
+
+@jit
+def dubins_velocity_kernel(eta, u_control, R, B):
+    """
+    nu = dubins_velocity_kernel(eta,u_control,R,B) is Dubins.velocity_batch()
+    written as a loop over the vehicles for the 'numba' backend.
+    """
+    nu = np.zeros_like(eta)
+    for i in range(eta.shape[0]):
+        v = (u_control[i, 0] + u_control[i, 1]) / 2 * R
+        nu[i, 0] = math.sin(eta[i, 3]) * v
+        nu[i, 1] = math.cos(eta[i, 3]) * v
+        nu[i, 3] = (u_control[i, 1] - u_control[i, 0]) * R / B
+    return nu
 
 
 class Dubins(Vehicle):
@@ -21,6 +37,8 @@ class Dubins(Vehicle):
         tau_X: surge force, pilot input (N)        
     """
     name = 'dubins'
+    heading_index = 3
+    __slots__ = ('n_max', 'n_min', 'R', 'B', 'L', 'nu', 'u_actual', 'controlDescription', 'controls', 'dimU')
     def __init__(
             self,
             controlSystem="stepInput",
@@ -31,13 +49,17 @@ class Dubins(Vehicle):
             serial_number=0,
             shift=None,
             color='b',
-            starting_point=None
+            starting_point=None,
+            integrator='euler',
+            dynamics_mode='standard'
     ):
         super().__init__(V_current,
                          serial_number,
                          shift,
                          color,
-                         starting_point)
+                         starting_point,
+                         integrator,
+                         dynamics_mode)
         # Initialize Dubins machine
         self.n_max = 10
         self.n_min = -5
@@ -62,14 +84,60 @@ class Dubins(Vehicle):
                 f'Control: {self.controlDescription}\n'
                 f'Wheel radius: {self.R} m\n'
                 f'Distance between the wheels: {self.B} m\n'
+                f'Integrator: {self.integrator}\n'
                 f'Starting point: [{self.starting_point[0]}, {self.starting_point[1]}]')
 
     def dynamics(self, eta, nu, u_actual, u_control, sampleTime):
+        if use_jit():
+            return dubins_velocity_kernel(eta[None], np.asarray(u_control, float)[None], self.R, self.B)[0], u_actual
         dx = np.cos(eta[3]) * (u_control[0] + u_control[1]) / 2 * self.R
         dy = np.sin(eta[3]) * (u_control[0] + u_control[1]) / 2 * self.R
         dtheta = (u_control[1] - u_control[0]) * self.R / self.B
         return np.array([dy, dx, 0, dtheta, 0, 0]), u_actual
 
+    def group_key(self):
+        return type(self), self.R, self.B
+
+    def dynamics_batch(self, eta, nu, u_actual, u_control, sampleTime, current=None):
+        return self.velocity_batch(eta, u_control), u_actual
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        return self.velocity_batch(eta, u_control), np.zeros_like(nu)
+
+    def actuators_batch(self, eta, nu, u_actual, u_control):
+        return self.velocity_batch(eta, u_control), u_actual
+
+    def velocity_batch(self, eta, u_control):
+        """
+        nu = velocity_batch(eta,u_control) returns the velocities of a group of
+        vehicles, they follow the wheel speeds without delay.
+        """
+        if use_jit():
+            return dubins_velocity_kernel(eta, np.asarray(u_control, float), self.R, self.B)
+        v = (u_control[:, 0] + u_control[:, 1]) / 2 * self.R
+        nu = np.zeros_like(eta)
+        nu[:, 0] = np.sin(eta[:, 3]) * v
+        nu[:, 1] = np.cos(eta[:, 3]) * v
+        nu[:, 3] = (u_control[:, 1] - u_control[:, 0]) * self.R / self.B
+        return nu
+
+    def advance_batch(self, eta, nu, u_actual, u_control, time_span):
+        """
+        [eta,nu] = advance_batch(eta,nu,u_actual,u_control,time_span) moves a group of
+        vehicles exactly over any time span with the wheel speeds held. The path is
+        a circular arc, or a straight line for equal wheel speeds: the vehicle
+        covers the chord v*h*sinc(omega*h/2) along the mean heading of the arc.
+        """
+        v = (u_control[:, 0] + u_control[:, 1]) / 2 * self.R
+        omega = (u_control[:, 1] - u_control[:, 0]) * self.R / self.B
+        half_turn = omega * time_span / 2
+        chord = v * time_span * np.sinc(half_turn / np.pi)  # np.sinc(x) = sin(pi*x)/(pi*x)
+        heading = eta[:, 3] + half_turn
+        eta[:, 0] += chord * np.sin(heading)
+        eta[:, 1] += chord * np.cos(heading)
+        eta[:, 3] += 2 * half_turn
+        return eta, self.velocity_batch(eta, u_control)
+
     def controlAllocation(self, tau_X, tau_N):
         """
         [n1, n2] = controlAllocation(tau_X, tau_N)
@@ -86,4 +154,8 @@ class Dubins(Vehicle):
     def repositioning(self, eta, nu, sample_time):
         # print(f'eta = {eta}')
         # print(f'nu = {nu}')
-        return eta+nu*sample_time
\ No newline at end of file
+        return eta+nu*sample_time
+
+    def repositioning_batch(self, eta, nu, sample_time):
+        eta += nu * sample_time
+        return eta
@@ -18,7 +18,13 @@ otter.py:
 Methods:
     
 [nu,u_actual] = dynamics(eta,nu,u_actual,u_control,sampleTime) returns 
-    nu[k+1] and u_actual[k+1] using Euler's method. The control inputs are:
+    nu[k+1] and u_actual[k+1] using Euler's method. With dynamics_mode='fast'
+    the constant matrix products are precomputed, the Coriolis terms are
+    evaluated in closed form and the intermediate vectors are kept in scratch
+    buffers. With dynamics_mode='transition' the velocities follow precomputed
+    discrete-time affine models of the three bang-bang inputs, tabulated over
+    the surge, sway and yaw rate, see transition_model() and transition_error().
+    The control inputs are:
 
     u_control = [ n1 n2 ]' where 
         n1: propeller shaft speed, left (rad/s)
@@ -27,10 +33,16 @@ Methods:
 u = headingAutopilot(eta,nu,sampleTime) 
     PID controller for automatic heading control based on pole placement.
 
+u = headingAutopilotBatch(eta,nu,state,sampleTime) is the same controller for
+    n vessels at once, the autopilot and reference model states are the
+    columns of the (n, 4) array state.
+
 u = stepInput(t) generates propeller step inputs.
 
 [n1, n2] = controlAllocation(tau_X, tau_N)     
     Control allocation algorithm.
+
+n = controlAllocationBatch(tau_X, tau_N) allocates the forces of n vessels.
     
 References: 
   T. I. Fossen (2021). Handbook of Marine Craft Hydrodynamics and Motion 
@@ -40,86 +52,40 @@ References:
 Author:     Thor I. Fossen
 """
 import math
+import warnings
+from functools import lru_cache
 from .vehicle import *
 from lib import attitudeEuler
 from tools.random_generators import *
-from lib.gnc import Smtrx, Hmtrx, Rzyx, m2c, crossFlowDrag, sat
+from lib.gnc import (Smtrx, Hmtrx, Rzyx, m2c, crossFlowDrag, crossFlowForces, sat, attitudeEulerBatch,
+                     kinematicsBatch, satBatch, coriolisBatch, crossFlowStrips, crossFlowKernel, ssa)
+from lib.control import PIDpolePlacement, refModel3
+from tools.backend import jit, use_jit
+from scipy.linalg import expm
 
 
-# Class Vehicle
-class Otter(Vehicle):
+class OtterParameters:
     """
-    otter()                                           Propeller step inputs
-    otter('headingAutopilot',psi_d,V_c,beta_c,tau_X)  Heading autopilot
-    
-    Inputs:
-        psi_d: desired heading angle (deg)
-        V_c: current speed (m/s)
-        beta_c: current direction (deg)
-        tau_X: surge force, pilot input (N)        
+    Mass, damping, hydrostatic and propeller parameters of the Otter USV. They
+    depend only on the constructor arguments, so one instance is shared by all
+    vessels built with the same arguments (see otter_parameters()).
     """
-    name = 'otter'
-    def __init__(
-            self,
-            controlSystem="stepInput",
-            r=0,
-            V_current=0,
-            beta_current=0,
-            tau_X=120,
-            serial_number=0,
-            shift=None,
-            color='b',
-            starting_point=None
-    ):
-        super().__init__(V_current,
-                         serial_number,
-                         shift,
-                         color,
-                         starting_point)
-        # Constants
-        D2R = math.pi / 180  # deg2rad
+    def __init__(self, m=55.0, mp=25.0, L=2.0, B=1.08):
         self.g = 9.81  # acceleration of gravity (m/s^2)
         rho = 1026  # density of water (kg/m^3)
 
-        # TODO: correct the description of the control system
-        if controlSystem == "headingAutopilot":
-            self.controlDescription = (
-                    "Heading autopilot, psi_d = "
-                    + str(r)
-                    + " deg"
-            )
-        else:
-            self.controlDescription = "sigma"
-            controlSystem = "Berman Law"
-            # self.controlDescription = "Step inputs for n1 and n2"
-            # controlSystem = "stepInput"
-
-        self.ref = r
-        self.beta_c = beta_current * D2R
-        self.controlMode = controlSystem
-        self.tauX = tau_X  # surge force (N)
-
         # Initialize the Otter USV model
         self.T_n = 1.0  # propeller time constants (s)
-        self.L = 2.0  # Length (m)
-        self.B = 1.08  # beam (m)
-        self.nu = np.array([0, 0, 0, 0, 0, 0], float)  # velocity vector
-        self.u_actual = np.array([0, 0], float)  # propeller revolution states
-        self.type = "Otter USV (see 'otter.py' for more details)"
-
-        self.controls = [
-            "Left propeller shaft speed (rad/s)",
-            "Right propeller shaft speed (rad/s)"
-        ]
-        self.dimU = len(self.controls)
+        self.L = L  # Length (m)
+        self.B = B  # beam (m)
 
         # Vehicle parameters
-        m = 55.0  # mass (kg)
-        self.mp = 25.0  # Payload (kg)
+        self.mp = mp  # Payload (kg)
         self.m_total = m + self.mp
         self.rp = np.array([0.05, 0, -0.35], float)  # location of payload (m)
         rg = np.array([0.2, 0, -0.2], float)  # CG for hull only (m)
         rg = (m * rg + self.mp * self.rp) / (m + self.mp)  # CG corrected for payload
+        self.rg = rg
         self.S_rg = Smtrx(rg)
         self.H_rg = Hmtrx(rg)
         self.S_rp = Smtrx(self.rp)
@@ -218,6 +184,247 @@ class Otter(Vehicle):
         B = self.k_pos * np.array([[1, 1], [-self.l1, -self.l2]])
         self.Binv = np.linalg.inv(B)
 
+        # Heading autopilot, yaw model m_yaw * r_dot + (m_yaw / T_yaw) * r = tau_N
+        self.m_yaw = 41.4  # moment of inertia in yaw including added mass
+        self.T_yaw = 1.0  # yaw time constant (s)
+
+        # Constants and scratch buffers of the fast dynamics, the buffers are shared
+        # by all vessels of the type since dynamics_fast() is not reentrant
+        self.MA_sym = 0.5 * (self.MA + self.MA.T)  # symmetric part used by m2c
+        self.Ig_rows = self.Ig.tolist()
+        self.rg_list = self.rg.tolist()
+        self.rp_list = self.rp.tolist()
+        self.d_yaw = 10 * float(self.D[5, 5])  # nonlinear yaw damping
+        self.buffers = np.zeros((5, 6))  # nu_r, MA*nu_r, D*nu_r, G*eta, sum_tau
+
+        self.transition_cache = {}  # sample time -> TransitionModel
+
+        # Scalar constants and cross-flow strips of otter_nu_dot_kernel()
+        k_crossflow, x0_crossflow, dx_crossflow, self.S_crossflow = crossFlowStrips(self.L, self.B_pont, self.T)
+        self.kernel_constants = np.array([self.m_total, self.mp * self.g, self.n_min, self.n_max, self.k_pos,
+                                          self.k_neg, self.l1, self.l2, self.d_yaw, k_crossflow, x0_crossflow,
+                                          dx_crossflow], float)
+
+
+@lru_cache(maxsize=None)
+def otter_parameters(m=55.0, mp=25.0, L=2.0, B=1.08) -> OtterParameters:
+    return OtterParameters(m, mp, L, B)
+
+
+@jit
+def otter_nu_dot_kernel(eta, nu, u_actual, current, constants, rg, rp, Ig, MA_sym, D, G, Minv, S):
+    """
+    nu_dot = otter_nu_dot_kernel(eta,nu,u_actual,current,...) is Otter.nu_dot_batch()
+    written as scalar loops over the vessels for the 'numba' backend, the terms
+    are those of Otter.dynamics_fast().
+    """
+    m_total, mpg, n_min, n_max, k_pos, k_neg, l1, l2, d_yaw, k_cf, x0_cf, dx_cf = (
+        constants[0], constants[1], constants[2], constants[3], constants[4], constants[5],
+        constants[6], constants[7], constants[8], constants[9], constants[10], constants[11])
+    gx, gy, gz = rg[0], rg[1], rg[2]
+    rpx, rpy, rpz = rp[0], rp[1], rp[2]
+    nu_dot = np.empty_like(nu)
+    nu_r = np.empty(6)
+    MA_nu = np.empty(6)
+    sum_tau = np.empty(6)
+
+    for i in range(eta.shape[0]):
+        phi, theta, psi = eta[i, 3], eta[i, 4], eta[i, 5]
+        p, q, r = nu[i, 3], nu[i, 4], nu[i, 5]
+
+        # Current velocities
+        u_c = current[i, 0] * math.cos(current[i, 1] - psi)  # current surge vel.
+        v_c = current[i, 0] * math.sin(current[i, 1] - psi)  # current sway vel.
+        for j in range(6):
+            nu_r[j] = nu[i, j]  # relative velocity vector
+        nu_r[0] -= u_c
+        nu_r[1] -= v_c
+        ur, vr, wr, pr, qr, rr = nu_r[0], nu_r[1], nu_r[2], nu_r[3], nu_r[4], nu_r[5]
+
+        # Rigid body Coriolis and centripetal forces CRB * nu_r
+        y0 = ur - gy * rr + gz * qr
+        y1 = vr - gz * pr + gx * rr
+        y2 = wr - gx * qr + gy * pr
+        z0 = m_total * (q * y2 - r * y1)
+        z1 = m_total * (r * y0 - p * y2)
+        z2 = m_total * (p * y1 - q * y0)
+        h0 = Ig[0, 0] * p + Ig[0, 1] * q + Ig[0, 2] * r
+        h1 = Ig[1, 0] * p + Ig[1, 1] * q + Ig[1, 2] * r
+        h2 = Ig[2, 0] * p + Ig[2, 1] * q + Ig[2, 2] * r
+        C0, C1, C2 = z0, z1, z2
+        C3 = gy * z2 - gz * z1 - (h1 * rr - h2 * qr)
+        C4 = gz * z0 - gx * z2 - (h2 * pr - h0 * rr)
+        C5 = gx * z1 - gy * z0 - (h0 * qr - h1 * pr)
+
+        # Added mass Coriolis and centripetal forces CA * nu_r, Munk moment neglected
+        for j in range(6):
+            MA_nu[j] = 0.0
+            for k in range(6):
+                MA_nu[j] += MA_sym[j, k] * nu_r[k]
+        d0, d1, d2, d3, d4, d5 = MA_nu[0], MA_nu[1], MA_nu[2], MA_nu[3], MA_nu[4], MA_nu[5]
+        C0 -= d1 * rr - d2 * qr
+        C1 -= d2 * pr - d0 * rr
+        C2 -= d0 * qr - d1 * pr
+        C3 -= d1 * wr - d2 * vr + d4 * rr - d5 * qr
+        C4 -= d2 * ur - d0 * wr + d5 * pr - d3 * rr
+        C5 -= d0 * vr - d1 * ur + d3 * qr - d4 * pr
+        C0 += d1 * rr
+        C1 -= d0 * rr
+        C5 -= d1 * ur - d0 * vr
+
+        # Payload force and moment expressed in BODY
+        cth = math.cos(theta)
+        f0 = -mpg * math.sin(theta)
+        f1 = mpg * cth * math.sin(phi)
+        f2 = mpg * cth * math.cos(phi)
+
+        # Control forces and moments - with propeller revolution saturation
+        n1 = min(max(u_actual[i, 0], n_min), n_max)
+        n2 = min(max(u_actual[i, 1], n_min), n_max)
+        thrust1 = (k_pos if n1 > 0 else k_neg) * n1 * abs(n1)
+        thrust2 = (k_pos if n2 > 0 else k_neg) * n2 * abs(n2)
+
+        # Cross-flow drag
+        Yh, Nh = crossFlowKernel(k_cf, x0_cf, dx_cf, S, vr, rr)
+
+        sum_tau[0] = thrust1 + thrust2 - C0 + f0
+        sum_tau[1] = Yh - C1 + f1
+        sum_tau[2] = -C2 + f2
+        sum_tau[3] = -C3 + rpy * f2 - rpz * f1
+        sum_tau[4] = -C4 + rpz * f0 - rpx * f2
+        sum_tau[5] = -l1 * thrust1 - l2 * thrust2 + Nh - C5 + rpx * f1 - rpy * f0 - d_yaw * abs(rr) * rr
+        # Hydrodynamic linear damping, restoring forces
+        for j in range(6):
+            for k in range(6):
+                sum_tau[j] -= D[j, k] * nu_r[k] + G[j, k] * eta[i, k]
+
+        for j in range(6):
+            nu_dot[i, j] = 0.0
+            for k in range(6):
+                nu_dot[i, j] += Minv[j, k] * sum_tau[k]  # USV dynamics
+        nu_dot[i, 0] += r * v_c
+        nu_dot[i, 1] -= r * u_c
+
+    return nu_dot
+
+
+class TransitionModel:
+    """
+    Discrete-time affine models nu[k+1] = Phi @ state[k] + Gamma of the Otter
+    velocities for the bang-bang inputs, state = [z, phi, theta, u, v, w, p, q, r].
+    Every input has one model per point of a regular grid over the relative
+    surge, sway and yaw rate, a vessel uses the model of the nearest point.
+    errors holds the transition_error() of each input, enabled the inputs whose
+    errors are within the tolerance.
+    """
+    def __init__(self, inputs, origin, spacing, shape, Phi, Gamma):
+        self.inputs = inputs
+        self.origin = origin
+        self.spacing = spacing
+        self.shape = shape
+        self.Phi = Phi  # (inputs, grid points, 6, 9)
+        self.Gamma = Gamma  # (inputs, grid points, 6)
+        self.errors = {}
+        self.enabled = np.ones(len(inputs), bool)
+
+    def __str__(self):
+        return '\n'.join(f'{mode}: velocity {error["velocity"]:.3g}, position {error["position"]:.3g} m'
+                         f'{"" if enabled else " (nonlinear dynamics used)"}'
+                         for (mode, error), enabled in zip(self.errors.items(), self.enabled))
+
+    def step(self, state, u_actual, enabled):
+        """
+        [nu,rows] = step(state,u_actual,enabled) returns the next velocities of the
+        rows whose input is one of the enabled inputs and whose state lies on the
+        grid, rows marks them; the other rows of nu are undefined.
+        """
+        index = np.rint((state[:, [3, 4, 8]] - self.origin) / self.spacing).astype(int)
+        on_grid = np.all((index >= 0) & (index < self.shape), axis=1)
+        cells = np.ravel_multi_index(np.clip(index, 0, self.shape - 1).T, self.shape)
+        nu_next = np.empty((len(state), 6))
+        rows = np.zeros(len(state), bool)
+        for m, u in enumerate(self.inputs):
+            if not enabled[m]:
+                continue
+            selected = np.all(u_actual == u, axis=1) & on_grid
+            cell = cells[selected]
+            nu_next[selected] = np.matmul(self.Phi[m, cell], state[selected, :, None])[..., 0] + self.Gamma[m, cell]
+            rows |= selected
+        return nu_next, rows
+
+
+# Class Vehicle
+class Otter(Vehicle):
+    """
+    otter()                                           Propeller step inputs
+    otter('headingAutopilot',psi_d,V_c,beta_c,tau_X)  Heading autopilot
+    
+    Inputs:
+        psi_d: desired heading angle (deg)
+        V_c: current speed (m/s)
+        beta_c: current direction (deg)
+        tau_X: surge force, pilot input (N)        
+    """
+    name = 'otter'
+    dynamics_modes = ('standard', 'fast', 'transition')
+    # relative surge (m/s), sway (m/s) and yaw rate (rad/s) of the transition models: first, last, spacing
+    transition_grid = ((-0.3, -0.4, -0.6), (1.0, 0.4, 0.6), (0.1, 0.05, 0.05))
+    transition_tolerance = (0.05, 0.25)  # largest velocity (m/s) and position (m) error over 20 s
+    parameters = staticmethod(otter_parameters)
+    controls = [
+        "Left propeller shaft speed (rad/s)",
+        "Right propeller shaft speed (rad/s)"
+    ]
+    dimU = len(controls)
+    __slots__ = ('params', 'controlDescription', 'ref', 'controlMode', 'tauX', 'nu', 'u_actual',
+                 'e_int', 'wn', 'zeta', 'r_max', 'psi_d', 'r_d', 'a_d', 'wn_d', 'zeta_d')
+    def __init__(
+            self,
+            controlSystem="stepInput",
+            r=0,
+            V_current=0,
+            beta_current=0,
+            tau_X=120,
+            serial_number=0,
+            shift=None,
+            color='b',
+            starting_point=None,
+            integrator='euler',
+            dynamics_mode='standard'
+    ):
+        super().__init__(V_current,
+                         serial_number,
+                         shift,
+                         color,
+                         starting_point,
+                         integrator,
+                         dynamics_mode)
+        # Constants
+        D2R = math.pi / 180  # deg2rad
+
+        # TODO: correct the description of the control system
+        if controlSystem == "headingAutopilot":
+            self.controlDescription = (
+                    "Heading autopilot, psi_d = "
+                    + str(r)
+                    + " deg"
+            )
+        else:
+            self.controlDescription = "sigma"
+            controlSystem = "Berman Law"
+            # self.controlDescription = "Step inputs for n1 and n2"
+            # controlSystem = "stepInput"
+
+        self.ref = r
+        self.beta_c = beta_current * D2R
+        self.controlMode = controlSystem
+        self.tauX = tau_X  # surge force (N)
+
+        self.params = self.parameters()
+        self.nu = np.array([0, 0, 0, 0, 0, 0], float)  # velocity vector
+        self.u_actual = np.array([0, 0], float)  # propeller revolution states
+        self.type = "Otter USV (see 'otter.py' for more details)"
+
         # Heading autopilot
         self.e_int = 0  # integral state
         self.wn = 1.2  # PID pole placement
@@ -231,11 +438,20 @@ class Otter(Vehicle):
         self.wn_d = self.wn / 5  # desired natural frequency in yaw
         self.zeta_d = 1  # desired relative damping ratio
 
+    def __getattr__(self, name):
+        # the shared parameters read as attributes of the vessel, e.g. otter.n_max; the
+        # special names (__dict__, ...) are not forwarded
+        if name == 'params' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.params, name)
+
     def __str__(self):
         return (f'---vehicle--------------------------------------------------------------------------\n'
                 f'{self.type}\n'
                 f'Length: {self.L} m\n'
                 f'Control: {self.controlDescription}\n'
+                f'Dynamics: {self.dynamics_mode}\n'
+                f'Integrator: {self.integrator}\n'
                 f'Starting point: [{self.starting_point[0]}, {self.starting_point[1]}]')
 
     def dynamics(self, eta, nu, u_actual, u_control, sampleTime):
@@ -243,6 +459,13 @@ class Otter(Vehicle):
         [nu,u_actual] = dynamics(eta,nu,u_actual,u_control,sampleTime) integrates
         the Otter USV equations of motion using Euler's method.
         """
+        if self.dynamics_mode == 'fast':
+            return self.dynamics_fast(eta, nu, u_actual, u_control, sampleTime, self.V_c, self.beta_c)
+        if self.dynamics_mode == 'transition':
+            nu, u_actual = self.dynamics_transition(eta[None], nu[None], np.asarray(u_actual, float)[None],
+                                                    np.asarray(u_control, float)[None], sampleTime)
+            return nu[0], u_actual[0]
+        params = self.params
 
         # Input vector
         n = np.array([u_actual[0], u_actual[1]])
@@ -259,11 +482,11 @@ class Otter(Vehicle):
         # CRB_CG = [ (m+mp) * Smtrx(nu2)          O3   (Fossen 2021, Chapter 6)
         #              O3                   -Smtrx(Ig*nu2)  ]
         CRB_CG = np.zeros((6, 6))
-        CRB_CG[0:3, 0:3] = self.m_total * Smtrx(nu[3:6])
-        CRB_CG[3:6, 3:6] = -Smtrx(np.matmul(self.Ig, nu[3:6]))
-        CRB = self.H_rg.T @ CRB_CG @ self.H_rg  # transform CRB from CG to CO
+        CRB_CG[0:3, 0:3] = params.m_total * Smtrx(nu[3:6])
+        CRB_CG[3:6, 3:6] = -Smtrx(np.matmul(params.Ig, nu[3:6]))
+        CRB = params.H_rg.T @ CRB_CG @ params.H_rg  # transform CRB from CG to CO
 
-        CA = m2c(self.MA, nu_r)
+        CA = m2c(params.MA, nu_r)
         CA[5, 0] = 0  # assume that the Munk moment in yaw can be neglected
         CA[5, 1] = 0  # if nonzero, must be balanced by adding nonlinear damping
         CA[0, 5] = 0
@@ -273,8 +496,8 @@ class Otter(Vehicle):
 
         # Payload force and moment expressed in BODY
         R = Rzyx(eta[3], eta[4], eta[5])
-        f_payload = np.matmul(R.T, np.array([0, 0, self.mp * self.g], float))
-        m_payload = np.matmul(self.S_rp, f_payload)
+        f_payload = np.matmul(R.T, np.array([0, 0, params.mp * params.g], float))
+        m_payload = np.matmul(params.S_rp, f_payload)
         g_0 = np.array([f_payload[0], f_payload[1], f_payload[2],
                         m_payload[0], m_payload[1], m_payload[2]])
 
@@ -282,12 +505,12 @@ class Otter(Vehicle):
         thrust = np.zeros(2)
         for i in range(0, 2):
 
-            n[i] = sat(n[i], self.n_min, self.n_max)  # saturation, physical limits
+            n[i] = sat(n[i], params.n_min, params.n_max)  # saturation, physical limits
 
             if n[i] > 0:  # positive thrust
-                thrust[i] = self.k_pos * n[i] * abs(n[i])
+                thrust[i] = params.k_pos * n[i] * abs(n[i])
             else:  # negative thrust
-                thrust[i] = self.k_neg * n[i] * abs(n[i])
+                thrust[i] = params.k_neg * n[i] * abs(n[i])
 
         # Control forces and moments
         tau = np.array(
@@ -297,22 +520,22 @@ class Otter(Vehicle):
                 0,
                 0,
                 0,
-                -self.l1 * thrust[0] - self.l2 * thrust[1],
+                -params.l1 * thrust[0] - params.l2 * thrust[1],
             ]
         )
 
         # Hydrodynamic linear damping + nonlinear yaw damping
-        tau_damp = -np.matmul(self.D, nu_r)
-        tau_damp[5] = tau_damp[5] - 10 * self.D[5, 5] * abs(nu_r[5]) * nu_r[5]
+        tau_damp = -np.matmul(params.D, nu_r)
+        tau_damp[5] = tau_damp[5] - 10 * params.D[5, 5] * abs(nu_r[5]) * nu_r[5]
 
         # State derivatives (with dimension)
-        tau_crossflow = crossFlowDrag(self.L, self.B_pont, self.T, nu_r)
+        tau_crossflow = crossFlowDrag(params.L, params.B_pont, params.T, nu_r)
         sum_tau = (
                 tau
                 + tau_damp
                 + tau_crossflow
                 - np.matmul(C, nu_r)
-                - np.matmul(self.G, eta)
+                - np.matmul(params.G, eta)
                 + g_0
         )
 
@@ -326,8 +549,8 @@ class Otter(Vehicle):
         # print(np.matmul(self.G, eta))
         # print(g_0)
 
-        nu_dot = Dnu_c + np.matmul(self.Minv, sum_tau)  # USV dynamics
-        n_dot = (u_control - n) / self.T_n  # propeller dynamics
+        nu_dot = Dnu_c + np.matmul(params.Minv, sum_tau)  # USV dynamics
+        n_dot = (u_control - n) / params.T_n  # propeller dynamics
 
         real = True
         # Forward Euler integration [k+1]
@@ -341,12 +564,435 @@ class Otter(Vehicle):
 
         return nu, u_actual
 
+    def dynamics_fast(self, eta, nu, u_actual, u_control, sampleTime, V_c, beta_c):
+        """
+        [nu,u_actual] = dynamics_fast(eta,nu,u_actual,u_control,sampleTime,V_c,beta_c)
+        is dynamics() without per-call matrices: the Coriolis, payload, thrust and
+        cross-flow terms are evaluated in closed form and the remaining constant
+        matrix products are written to preallocated buffers.
+        """
+        params = self.params
+        nu_r, MA_nu, D_nu, G_eta, sum_tau = params.buffers
+        _, _, _, phi, theta, psi = eta.tolist()
+        p, q, r = nu[3:6].tolist()
+
+        # Current velocities
+        u_c = V_c * math.cos(beta_c - psi)  # current surge vel.
+        v_c = V_c * math.sin(beta_c - psi)  # current sway vel.
+        nu_r[:] = nu  # relative velocity vector
+        nu_r[0] -= u_c
+        nu_r[1] -= v_c
+        ur, vr, wr, pr, qr, rr = nu_r.tolist()
+
+        # Rigid body Coriolis and centripetal forces CRB * nu_r, CRB = H_rg' * CRB_CG * H_rg
+        gx, gy, gz = params.rg_list
+        y0 = ur - gy * rr + gz * qr  # [y; nu2] = H_rg * nu_r
+        y1 = vr - gz * pr + gx * rr
+        y2 = wr - gx * qr + gy * pr
+        z0 = params.m_total * (q * y2 - r * y1)  # (m+mp) * Smtrx(nu2) * y
+        z1 = params.m_total * (r * y0 - p * y2)
+        z2 = params.m_total * (p * y1 - q * y0)
+        h0, h1, h2 = (row[0] * p + row[1] * q + row[2] * r for row in params.Ig_rows)  # Ig * nu2
+        C0, C1, C2 = z0, z1, z2
+        C3 = gy * z2 - gz * z1 - (h1 * rr - h2 * qr)
+        C4 = gz * z0 - gx * z2 - (h2 * pr - h0 * rr)
+        C5 = gx * z1 - gy * z0 - (h0 * qr - h1 * pr)
+
+        # Added mass Coriolis and centripetal forces CA * nu_r (see m2c)
+        np.dot(params.MA_sym, nu_r, out=MA_nu)
+        d0, d1, d2, d3, d4, d5 = MA_nu.tolist()
+        C0 -= d1 * rr - d2 * qr
+        C1 -= d2 * pr - d0 * rr
+        C2 -= d0 * qr - d1 * pr
+        C3 -= d1 * wr - d2 * vr + d4 * rr - d5 * qr
+        C4 -= d2 * ur - d0 * wr + d5 * pr - d3 * rr
+        C5 -= d0 * vr - d1 * ur + d3 * qr - d4 * pr
+        # the Munk moment in yaw is neglected: CA[5,0] = CA[5,1] = CA[0,5] = CA[1,5] = 0
+        C0 += d1 * rr
+        C1 -= d0 * rr
+        C5 -= d1 * ur - d0 * vr
+
+        # Payload force and moment expressed in BODY: R' * [0 0 mp*g]
+        cth = math.cos(theta)
+        f0 = -params.mp * params.g * math.sin(theta)
+        f1 = params.mp * params.g * cth * math.sin(phi)
+        f2 = params.mp * params.g * cth * math.cos(phi)
+        rpx, rpy, rpz = params.rp_list
+
+        # Control forces and moments - with propeller revolution saturation
+        n1, n2 = (min(max(n, params.n_min), params.n_max) for n in u_actual.tolist())
+        thrust1 = (params.k_pos if n1 > 0 else params.k_neg) * n1 * abs(n1)
+        thrust2 = (params.k_pos if n2 > 0 else params.k_neg) * n2 * abs(n2)
+
+        # Cross-flow drag, strip theory in closed form
+        Yh, Nh = crossFlowForces(params.L, params.B_pont, params.T, vr, rr)
+
+        # Hydrodynamic linear damping + nonlinear yaw damping, restoring forces
+        np.dot(params.D, nu_r, out=D_nu)
+        np.dot(params.G, eta, out=G_eta)
+        sum_tau[:] = (thrust1 + thrust2 - C0 + f0,
+                      Yh - C1 + f1,
+                      -C2 + f2,
+                      -C3 + rpy * f2 - rpz * f1,
+                      -C4 + rpz * f0 - rpx * f2,
+                      -params.l1 * thrust1 - params.l2 * thrust2 + Nh - C5 + rpx * f1 - rpy * f0
+                      - params.d_yaw * abs(rr) * rr)
+        sum_tau -= D_nu
+        sum_tau -= G_eta
+
+        nu_dot = np.dot(params.Minv, sum_tau)  # USV dynamics
+        nu_dot[0] += r * v_c
+        nu_dot[1] -= r * u_c
+
+        # Forward Euler integration [k+1], propeller revolutions follow the command
+        nu_dot *= sampleTime
+        nu_dot += nu
+        return nu_dot, np.array(u_control, float)
+
+    def dynamics_error(self, samples=1000, seed=0):
+        """
+        error = dynamics_error(samples,seed) compares dynamics_fast() with the
+        standard dynamics() on random states and returns the largest relative
+        difference of nu[k+1].
+        """
+        rng = np.random.default_rng(seed)
+        mode = self.dynamics_mode
+        self.dynamics_mode = 'standard'
+        error = 0.0
+        for _ in range(samples):
+            eta = np.concatenate((rng.uniform(-50, 50, 3), rng.uniform(-math.pi, math.pi, 3)))
+            nu = rng.uniform(-3, 3, 6)
+            u_actual = rng.uniform(1.2 * self.n_min, 1.2 * self.n_max, 2)
+            u_control = rng.uniform(self.n_min, self.n_max, 2)
+            V_c, beta_c = rng.uniform(0, 1), rng.uniform(-math.pi, math.pi)
+            self.V_c, self.beta_c, V_c_0, beta_c_0 = V_c, beta_c, self.V_c, self.beta_c
+            nu_standard, _ = self.dynamics(eta, nu, u_actual, u_control, 0.02)
+            self.V_c, self.beta_c = V_c_0, beta_c_0
+            nu_fast, _ = self.dynamics_fast(eta, nu, u_actual, u_control, 0.02, V_c, beta_c)
+            error = max(error, float(np.max(np.abs(nu_fast - nu_standard) / (1 + np.abs(nu_standard)))))
+        self.dynamics_mode = mode
+        return error
+
+    def group_key(self):
+        return type(self), self.params, self.dynamics_mode
+
+    def dynamics_batch(self, eta, nu, u_actual, u_control, sampleTime, current=None):
+        """
+        [nu,u_actual] = dynamics_batch(eta,nu,u_actual,u_control,sampleTime,current)
+        integrates the Otter USV equations of motion for a group of vessels stored
+        row-wise in (n, 6) and (n, 2) arrays using Euler's method.
+        """
+        if self.dynamics_mode == 'transition':
+            return self.dynamics_transition(eta, nu, u_actual, u_control, sampleTime, current)
+        if self.dynamics_mode == 'fast' and not use_jit():
+            # vessel by vessel, faster than the vectorised path for a few vessels
+            nu_next = np.empty_like(nu)
+            for row in range(len(eta)):
+                V_c, beta_c = (self.V_c, self.beta_c) if current is None else current[row]
+                nu_next[row], _ = self.dynamics_fast(eta[row], nu[row], u_actual[row], u_control[row], sampleTime,
+                                                     V_c, beta_c)
+            return nu_next, np.array(u_control, float)
+
+        nu_dot = self.nu_dot_batch(eta, nu, u_actual, current)
+
+        # Forward Euler integration [k+1], propeller revolutions follow the command
+        nu = nu + sampleTime * nu_dot
+        u_actual = np.array(u_control, float)
+
+        return nu, u_actual
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        return kinematicsBatch(eta, nu), self.nu_dot_batch(eta, nu, u_actual, current)
+
+    def mode_inputs(self):
+        """
+        The three propeller inputs of the bang-bang controllers: turn with the
+        left propeller reversed, turn with the right one reversed, propellers off.
+        """
+        return np.array([[self.n_min, self.n_max], [self.n_max, self.n_min], [0, 0]], float)
+
+    def mode_derivatives(self, state, u_actual):
+        """
+        state_dot = mode_derivatives(state,u_actual) of the states
+        [z, phi, theta, u, v, w, p, q, r] that enter the velocity dynamics, stored
+        row-wise, in still water. North, east and yaw do not.
+        """
+        eta = np.zeros((len(state), 6))
+        eta[:, 2:5] = state[:, 0:3]
+        nu = state[:, 3:9].copy()
+        return np.hstack((kinematicsBatch(eta, nu)[:, 2:5],
+                          self.nu_dot_batch(eta, nu, u_actual, np.zeros((len(state), 2)))))
+
+    def transition_model(self, sample_time):
+        """
+        model = transition_model(sample_time) returns the TransitionModel of the
+        mode_inputs() for the states of mode_derivatives().
+
+        For every input the dynamics are linearised on a grid of surge, sway and
+        yaw rate values, the remaining states at the steady state of the input,
+        and discretised exactly with the matrix exponential of the affine system.
+        The models are then checked with transition_error(), inputs whose error
+        exceeds transition_tolerance are not used and a warning lists the errors
+        of all inputs. The models are computed once per hull and sample time.
+        """
+        params = self.params
+        if sample_time in params.transition_cache:
+            return params.transition_cache[sample_time]
+        U = self.mode_inputs()
+        start, stop = np.array(self.transition_grid[0]), np.array(self.transition_grid[1])
+        spacing = np.array(self.transition_grid[2])
+        shape = np.rint((stop - start) / spacing).astype(int) + 1
+        axes = [start[k] + spacing[k] * np.arange(shape[k]) for k in range(3)]
+        points = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+
+        # heave, roll, pitch and the other velocities settle from rest
+        steady = np.zeros((len(U), 9))
+        for _ in range(500):
+            steady += 0.02 * self.mode_derivatives(steady, U)
+
+        Phi = np.empty((len(U), len(points), 6, 9))
+        Gamma = np.empty((len(U), len(points), 6))
+        for m, u in enumerate(U):
+            s0 = np.tile(steady[m], (len(points), 1))
+            s0[:, [3, 4, 8]] = points
+            inputs = np.tile(u, (len(points), 1))
+
+            # Jacobians by central differences, state_dot = J @ state + c about s0
+            J = np.empty((len(points), 9, 9))
+            for j in range(9):
+                step = np.zeros(9)
+                step[j] = 1e-6
+                J[:, :, j] = (self.mode_derivatives(s0 + step, inputs) - self.mode_derivatives(s0 - step, inputs)) / 2e-6
+            c = self.mode_derivatives(s0, inputs) - np.einsum('nij,nj->ni', J, s0)
+
+            # Exact discretisation, expm([[J, c], [0, 0]] * h) = [[Phi, Gamma], [0, 1]]
+            A = np.zeros((len(points), 10, 10))
+            A[:, :9, :9] = J
+            A[:, :9, 9] = c
+            E = expm(A * sample_time)
+            Phi[m] = E[:, 3:9, :9]
+            Gamma[m] = E[:, 3:9, 9]
+
+        model = TransitionModel(U, start, spacing, shape, Phi, Gamma)
+        params.transition_cache[sample_time] = model
+
+        model.errors = self.transition_error(sample_time)
+        velocity_tol, position_tol = self.transition_tolerance
+        model.enabled = np.array([error["velocity"] <= velocity_tol and error["position"] <= position_tol
+                                  for error in model.errors.values()])
+        if not model.enabled.all():
+            warnings.warn(f"Transition model errors above {velocity_tol} m/s or {position_tol} m, the nonlinear "
+                          f"dynamics are used for these inputs:\n{model}", RuntimeWarning)
+        return model
+
+    def dynamics_transition(self, eta, nu, u_actual, u_control, sampleTime, current=None):
+        """
+        [nu,u_actual] = dynamics_transition(eta,nu,u_actual,u_control,sampleTime,current)
+        propagates the velocities with the transition_model() of the input and
+        the grid point nearest to each vessel. The model acts on the velocity
+        relative to the current; rows with other or disabled inputs and rows off
+        the grid fall back to the nonlinear equations of motion.
+        """
+        model = self.transition_model(sampleTime)
+        return self._transition_step(model, eta, nu, u_actual, sampleTime, current, model.enabled), \
+            np.array(u_control, float)
+
+    def _transition_step(self, model, eta, nu, u_actual, sampleTime, current, enabled):
+        if current is None:
+            V_c, beta_c = self.V_c, self.beta_c
+        else:
+            V_c, beta_c = current[:, 0], current[:, 1]
+
+        # Current velocities
+        u_c = V_c * np.cos(beta_c - eta[:, 5])  # current surge vel.
+        v_c = V_c * np.sin(beta_c - eta[:, 5])  # current sway vel.
+
+        state = np.hstack((eta[:, 2:5], nu))
+        state[:, 3] -= u_c
+        state[:, 4] -= v_c
+        nu_next, rows = model.step(state, u_actual, enabled)
+
+        # back to the absolute velocity, the current turns with the vessel
+        r = nu[:, 5]
+        nu_next[:, 0] += u_c + sampleTime * r * v_c
+        nu_next[:, 1] += v_c - sampleTime * r * u_c
+        if not rows.all():
+            others = ~rows
+            nu_next[others] = nu[others] + sampleTime * self.nu_dot_batch(
+                eta[others], nu[others], u_actual[others], None if current is None else current[others])
+        return nu_next
+
+    def transition_error(self, sample_time=0.02, duration=20.0, samples=10, seed=0):
+        """
+        errors = transition_error(sample_time,duration,samples,seed) holds each input
+        of transition_model() for duration seconds, from rest, from the steady
+        states of the inputs and from random states, next to the nonlinear
+        dynamics, and returns the largest velocity (m/s, rad/s) and position (m)
+        differences. Disabled inputs are evaluated with their models as well.
+        """
+        rng = np.random.default_rng(seed)
+        model = self.transition_model(sample_time)
+        U = model.inputs
+        steady = np.zeros((len(U), 9))
+        for _ in range(round(duration / sample_time)):
+            steady += sample_time * self.mode_derivatives(steady, U)
+        starts = np.vstack((np.zeros(9), steady,
+                            np.hstack((rng.uniform(-0.02, 0.02, (samples, 3)),
+                                       rng.uniform(-1, 1, (samples, 6)) * [1, 0.5, 0.1, 0.1, 0.1, 0.3]))))
+        still_water = np.zeros((len(starts), 2))
+        errors = {}
+        for u in U:
+            eta = np.zeros((len(starts), 6))
+            eta[:, 2:5] = starts[:, 0:3]
+            nu = starts[:, 3:9].copy()
+            u_actual = np.tile(u, (len(starts), 1))
+            eta_model, nu_model = eta.copy(), nu.copy()
+            error_nu = error_eta = 0.0
+            for _ in range(round(duration / sample_time)):
+                nu = nu + sample_time * self.nu_dot_batch(eta, nu, u_actual, still_water)
+                eta = attitudeEulerBatch(eta, nu, sample_time)
+                nu_model = self._transition_step(model, eta_model, nu_model, u_actual, sample_time, still_water,
+                                                 np.ones(len(U), bool))
+                eta_model = attitudeEulerBatch(eta_model, nu_model, sample_time)
+                error_nu = max(error_nu, float(np.max(np.abs(nu_model - nu))))
+                error_eta = max(error_eta, float(np.max(np.hypot(*(eta_model - eta)[:, 0:2].T))))
+            errors[f'[{u[0]:.4g}, {u[1]:.4g}]'] = {"velocity": error_nu, "position": error_eta}
+        return errors
+
+    def actuators_batch(self, eta, nu, u_actual, u_control):
+        return nu, np.array(u_control, float)
+
+    def nu_dot_batch(self, eta, nu, u_actual, current=None):
+        """
+        nu_dot = nu_dot_batch(eta,nu,u_actual,current) evaluates the Otter USV
+        equations of motion for a group of vessels stored row-wise in (n, 6) and
+        (n, 2) arrays. The matrix products of dynamics() are evaluated in closed
+        form with cross products, so no per-vessel matrices are built. The 'numba'
+        backend evaluates otter_nu_dot_kernel() instead.
+        """
+        params = self.params
+        if use_jit():
+            if current is None:
+                current = np.empty((len(eta), 2))
+                current[:] = self.V_c, self.beta_c
+            return otter_nu_dot_kernel(eta, nu, u_actual, current, params.kernel_constants, params.rg, params.rp,
+                                       params.Ig, params.MA_sym, params.D, params.G, params.Minv,
+                                       params.S_crossflow)
+        if current is None:
+            V_c, beta_c = self.V_c, self.beta_c
+        else:
+            V_c, beta_c = current[:, 0], current[:, 1]
+
+        # Current velocities
+        u_c = V_c * np.cos(beta_c - eta[:, 5])  # current surge vel.
+        v_c = V_c * np.sin(beta_c - eta[:, 5])  # current sway vel.
+
+        nu_r = nu.copy()  # relative velocity vector
+        nu_r[:, 0] -= u_c
+        nu_r[:, 1] -= v_c
+        Dnu_c = np.zeros_like(nu)  # derivative
+        Dnu_c[:, 0] = nu[:, 5] * v_c
+        Dnu_c[:, 1] = -nu[:, 5] * u_c
+
+        # Rigid body Coriolis and centripetal forces CRB * nu_r with
+        # CRB = H_rg' * CRB_CG * H_rg and H_rg * x = [x1 - rg x x2, x2]
+        nu2 = nu[:, 3:6]
+        y1 = nu_r[:, 0:3] - np.cross(params.rg, nu_r[:, 3:6])
+        z1 = params.m_total * np.cross(nu2, y1)
+        z2 = -np.cross(nu2 @ params.Ig.T, nu_r[:, 3:6])
+        C_nu = np.hstack((z1, np.cross(params.rg, z1) + z2))
+
+        # Added mass Coriolis and centripetal forces CA * nu_r (see m2c)
+        CA_nu = coriolisBatch(params.MA_sym, nu_r)
+        dt_dnu1 = nu_r @ params.MA_sym[0:3].T
+        # the Munk moment in yaw is neglected: CA[5,0] = CA[5,1] = CA[0,5] = CA[1,5] = 0
+        CA_nu[:, 0] += dt_dnu1[:, 1] * nu_r[:, 5]
+        CA_nu[:, 1] -= dt_dnu1[:, 0] * nu_r[:, 5]
+        CA_nu[:, 5] -= dt_dnu1[:, 1] * nu_r[:, 0] - dt_dnu1[:, 0] * nu_r[:, 1]
+        C_nu += CA_nu
+
+        # Payload force and moment expressed in BODY: R' * [0 0 mp*g]
+        cth = np.cos(eta[:, 4])
+        f_payload = params.mp * params.g * np.column_stack((-np.sin(eta[:, 4]),
+                                                          cth * np.sin(eta[:, 3]),
+                                                          cth * np.cos(eta[:, 3])))
+        g_0 = np.hstack((f_payload, np.cross(params.rp, f_payload)))
+
+        # Control forces and moments - with propeller revolution saturation
+        n = satBatch(u_actual, params.n_min, params.n_max)
+        thrust = np.where(n > 0, params.k_pos, params.k_neg) * n * np.abs(n)
+        tau = np.zeros_like(nu)
+        tau[:, 0] = thrust[:, 0] + thrust[:, 1]
+        tau[:, 5] = -params.l1 * thrust[:, 0] - params.l2 * thrust[:, 1]
+
+        # Hydrodynamic linear damping + nonlinear yaw damping
+        tau_damp = -nu_r @ params.D.T
+        tau_damp[:, 5] -= 10 * params.D[5, 5] * np.abs(nu_r[:, 5]) * nu_r[:, 5]
+
+        # State derivatives (with dimension)
+        tau_crossflow = crossFlowDrag(params.L, params.B_pont, params.T, nu_r)
+        sum_tau = tau + tau_damp + tau_crossflow - C_nu - eta @ params.G.T + g_0
+
+        nu_dot = Dnu_c + sum_tau @ params.Minv.T  # USV dynamics
+
+        return nu_dot
+
+    def headingAutopilot(self, eta, nu, sampleTime):
+        """
+        u = headingAutopilot(eta,nu,sampleTime) is a PID controller
+        for automatic heading control based on pole placement.
+
+        tau_N = (T/K) * a_d + (1/K) * rd
+               - Kp * ( ssa( psi-psi_d ) + Td * (r - r_d) + (1/Ti) * z )
+
+        The desired heading psi_d follows the reference angle self.ref (deg)
+        through a 3rd-order reference model.
+        """
+        state = np.array([[self.e_int, self.psi_d, self.r_d, self.a_d]], float)
+        u_control = self.headingAutopilotBatch(eta[None], nu[None], state, sampleTime)
+        self.e_int, self.psi_d, self.r_d, self.a_d = state[0]
+
+        return u_control[0]
+
+    def headingAutopilotBatch(self, eta, nu, state, sampleTime, psi_ref=None, tau_X=None):
+        """
+        u = headingAutopilotBatch(eta,nu,state,sampleTime) is headingAutopilot()
+        for the (n, 6) arrays eta and nu. The columns of the (n, 4) array state
+        are [e_int, psi_d, r_d, a_d] and are updated in place. psi_ref (rad) and
+        tau_X default to self.ref and self.tauX, both may have one entry per
+        vessel. Returns the (n, 2) propeller commands.
+        """
+        params = self.params
+        if psi_ref is None:
+            psi_ref = self.ref * math.pi / 180
+        if tau_X is None:
+            tau_X = self.tauX
+        e_int, psi_d, r_d, a_d = state.T
+
+        e_psi = ssa(eta[:, 5] - psi_d)
+        e_r = nu[:, 5] - r_d
+
+        m = params.m_yaw
+        d = m / params.T_yaw
+        k = 0
+
+        # PID feedback controller with 3rd-order reference model
+        tau_N, state[:, 0] = PIDpolePlacement(e_int, e_psi, e_r, psi_d, r_d, a_d, m, d, k,
+                                              self.wn, self.zeta, sampleTime)
+        u_control = self.controlAllocationBatch(np.broadcast_to(tau_X, tau_N.shape), tau_N)
+
+        state[:, 1], state[:, 2], state[:, 3] = refModel3(psi_d, r_d, a_d, psi_ref, self.r_max,
+                                                          self.zeta_d, self.wn_d, sampleTime)
+
+        return u_control
+
     def controlAllocation(self, tau_X, tau_N):
         """
         [n1, n2] = controlAllocation(tau_X, tau_N)
         """
+        params = self.params
         tau = np.array([tau_X, tau_N])  # tau = B * u_alloc
-        u_alloc = np.matmul(self.Binv, tau)  # u_alloc = inv(B) * tau
+        u_alloc = np.matmul(params.Binv, tau)  # u_alloc = inv(B) * tau
 
         # u_alloc = abs(n) * n --> n = sign(u_alloc) * sqrt(u_alloc)
         n1 = np.sign(u_alloc[0]) * math.sqrt(abs(u_alloc[0]))
@@ -354,5 +1000,18 @@ class Otter(Vehicle):
 
         return n1, n2
 
+    def controlAllocationBatch(self, tau_X, tau_N):
+        """
+        n = controlAllocationBatch(tau_X, tau_N) is controlAllocation() for
+        arrays of forces, returns the (n, 2) propeller shaft speeds.
+        """
+        tau = np.column_stack((tau_X, tau_N))
+        u_alloc = tau @ self.params.Binv.T
+
+        return np.sign(u_alloc) * np.sqrt(np.abs(u_alloc))
+
     def repositioning(self, eta, nu, sample_time):
-        return attitudeEuler(eta, nu, sample_time)
\ No newline at end of file
+        return attitudeEuler(eta, nu, sample_time)
+
+    def repositioning_batch(self, eta, nu, sample_time):
+        return attitudeEulerBatch(eta, nu, sample_time)
\ No newline at end of file
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+otter3dof.py:
+    Reduced surge, sway and yaw model of the Maritime Robotics Otter USV for
+    large swarms. The mass, damping and propeller parameters are those of the
+    6-DOF Otter; heave, roll and pitch and with them the hydrostatic and payload
+    terms are dropped. The state keeps the 6-DOF layout of the swarm engine,
+    the vertical entries of eta and nu stay zero.
+
+Methods:
+
+[nu,u_actual] = dynamics(eta,nu,u_actual,u_control,sampleTime) returns
+    nu[k+1] and u_actual[k+1] using Euler's method.
+
+nu_dot = nu_dot_batch(eta,nu,u_actual,current) evaluates
+
+    M3 * nu_dot + C3(nu) * nu_r + D3(nu_r) * nu_r = tau + tau_crossflow
+
+    with nu = [u v r]', where M3 and D3 are the surge, sway and yaw rows and
+    columns of M and D. The added mass Coriolis terms vanish once the Munk
+    moment is neglected as in the 6-DOF model.
+
+eta = repositioning(eta,nu,sampleTime) planar kinematics.
+
+References:
+  T. I. Fossen (2021). Handbook of Marine Craft Hydrodynamics and Motion
+     Control. 2nd. Edition, Wiley.
+     URL: www.fossen.biz/wiley
+"""
+from .otter import *
+
+
+DOF3 = [0, 1, 5]  # surge, sway and yaw in the 6-DOF vectors
+
+
+class Otter3DOFParameters(OtterParameters):
+    def __init__(self, m=55.0, mp=25.0, L=2.0, B=1.08):
+        super().__init__(m, mp, L, B)
+        self.M3 = self.M[np.ix_(DOF3, DOF3)]
+        self.M3inv = np.linalg.inv(self.M3)
+        self.D3 = self.D[np.ix_(DOF3, DOF3)]
+
+
+@lru_cache(maxsize=None)
+def otter3dof_parameters(m=55.0, mp=25.0, L=2.0, B=1.08) -> Otter3DOFParameters:
+    return Otter3DOFParameters(m, mp, L, B)
+
+
+class Otter3DOF(Otter):
+    name = 'otter3dof'
+    dynamics_modes = ('standard',)
+    parameters = staticmethod(otter3dof_parameters)
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.type = "Otter USV, 3-DOF surge, sway and yaw (see 'otter3dof.py' for more details)"
+
+    def dynamics(self, eta, nu, u_actual, u_control, sampleTime):
+        """
+        [nu,u_actual] = dynamics(eta,nu,u_actual,u_control,sampleTime) integrates
+        the 3-DOF equations of motion using Euler's method.
+        """
+        nu, u_actual = self.dynamics_batch(eta[None], nu[None], np.asarray(u_actual, float)[None],
+                                           np.asarray(u_control, float)[None], sampleTime)
+        return nu[0], u_actual[0]
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        return self.kinematics_batch(eta, nu), self.nu_dot_batch(eta, nu, u_actual, current)
+
+    def nu_dot_batch(self, eta, nu, u_actual, current=None):
+        """
+        nu_dot = nu_dot_batch(eta,nu,u_actual,current) evaluates the 3-DOF equations
+        of motion for a group of vessels stored row-wise in (n, 6) and (n, 2) arrays.
+        """
+        params = self.params
+        if current is None:
+            V_c, beta_c = self.V_c, self.beta_c
+        else:
+            V_c, beta_c = current[:, 0], current[:, 1]
+
+        # Current velocities
+        u_c = V_c * np.cos(beta_c - eta[:, 5])  # current surge vel.
+        v_c = V_c * np.sin(beta_c - eta[:, 5])  # current sway vel.
+
+        r = nu[:, 5]
+        nu_r = nu.copy()  # relative velocity vector
+        nu_r[:, 0] -= u_c
+        nu_r[:, 1] -= v_c
+        u_r, v_r = nu_r[:, 0], nu_r[:, 1]
+
+        # Rigid body Coriolis and centripetal forces CRB * nu_r about CO, CG at rg
+        y0 = u_r - params.rg[1] * r
+        y1 = v_r + params.rg[0] * r
+        C_nu = params.m_total * r * np.stack((-y1, y0, params.rg[0] * y0 + params.rg[1] * y1))
+
+        # Control forces and moments - with propeller revolution saturation
+        n = satBatch(u_actual, params.n_min, params.n_max)
+        thrust = np.where(n > 0, params.k_pos, params.k_neg) * n * np.abs(n)
+
+        # Hydrodynamic linear damping + nonlinear yaw damping + cross-flow drag
+        tau_damp = -params.D3 @ nu_r[:, DOF3].T
+        tau_damp[2] -= params.d_yaw * np.abs(r) * r
+        tau_crossflow = crossFlowDrag(params.L, params.B_pont, params.T, nu_r)
+
+        sum_tau = tau_damp - C_nu
+        sum_tau[0] += thrust[:, 0] + thrust[:, 1]
+        sum_tau[1] += tau_crossflow[:, 1]
+        sum_tau[2] += -params.l1 * thrust[:, 0] - params.l2 * thrust[:, 1] + tau_crossflow[:, 5]
+
+        nu_dot = np.zeros_like(nu)
+        nu_dot[:, DOF3] = (params.M3inv @ sum_tau).T  # USV dynamics
+        nu_dot[:, 0] += r * v_c
+        nu_dot[:, 1] -= r * u_c
+        return nu_dot
+
+    @staticmethod
+    def kinematics_batch(eta, nu):
+        """
+        eta_dot = kinematics_batch(eta,nu) planar kinematics x_dot = R(psi) * [u v]',
+        psi_dot = r of a group of vessels.
+        """
+        cpsi = np.cos(eta[:, 5])
+        spsi = np.sin(eta[:, 5])
+        eta_dot = np.zeros_like(eta)
+        eta_dot[:, 0] = cpsi * nu[:, 0] - spsi * nu[:, 1]
+        eta_dot[:, 1] = spsi * nu[:, 0] + cpsi * nu[:, 1]
+        eta_dot[:, 5] = nu[:, 5]
+        return eta_dot
+
+    def repositioning(self, eta, nu, sample_time):
+        return self.repositioning_batch(eta[None], nu[None], sample_time)[0]
+
+    def repositioning_batch(self, eta, nu, sample_time):
+        eta += sample_time * self.kinematics_batch(eta, nu)
+        return eta
@@ -5,15 +5,24 @@ import numpy as np
 
 class Vehicle:
     name = 'vehicle'
+    heading_index = 5  # index of the heading angle in eta and of its rate in nu
+    dynamics_modes = ('standard',)  # implementations of dynamics() offered by the vehicle
+    # per-vessel state only, shared parameters live in class attributes or parameter
+    # objects; the vessels have no instance __dict__
+    __slots__ = ('V_c', 'beta_c', 'type', 'linestyle', 'serial_number', 'starting_point', 'color', 'integrator',
+                 'dynamics_mode', 'data_storage')
     def __init__(
             self,
             V_current=0,
             serial_number=0,
             shift=None,
             color='b',
-            starting_point=None
+            starting_point=None,
+            integrator='euler',
+            dynamics_mode='standard'
     ):
         self.V_c = V_current
+        self.beta_c = 0
         self.type = ""
         self.linestyle = '-'
         self.serial_number = serial_number
@@ -24,6 +33,10 @@ class Vehicle:
         else:
             self.starting_point = np.array(starting_point, float) + np.array(shift, float)
         self.color = color
+        self.integrator = integrator
+        if dynamics_mode not in self.dynamics_modes:
+            raise ValueError(f"Unknown dynamics mode of {self.name}: {dynamics_mode}, expected one of {self.dynamics_modes}")
+        self.dynamics_mode = dynamics_mode
         self.data_storage = None
 
     def dynamics(self, eta, nu, u_actual, u_control, sampleTime):
@@ -35,5 +48,58 @@ class Vehicle:
     def repositioning(self, eta, nu, sample_time):
         pass
 
+    def group_key(self):
+        """
+        Key used by the swarm engine to group vehicles that can be advanced with one
+        batched call. Vehicles without a vectorised model form a group of their own.
+        """
+        return type(self), id(self)
+
+    def dynamics_batch(self, eta, nu, u_actual, u_control, sampleTime, current=None):
+        """
+        [nu,u_actual] = dynamics_batch(eta,nu,u_actual,u_control,sampleTime,current)
+        propagates a group of vehicles stored row-wise in (n, 6) and (n, dimU) arrays.
+        current is an optional (n, 2) array of [V_c, beta_c] per vehicle.
+        The default implementation falls back to dynamics() row by row.
+        """
+        nu_next = np.empty_like(nu)
+        u_actual_next = np.empty_like(u_actual)
+        for row in range(len(eta)):
+            nu_next[row], u_actual_next[row] = self.dynamics(eta[row], nu[row], u_actual[row], u_control[row],
+                                                             sampleTime)
+        return nu_next, u_actual_next
+
+    def derivatives_batch(self, eta, nu, u_actual, u_control, current=None):
+        """
+        [eta_dot,nu_dot] = derivatives_batch(eta,nu,u_actual,u_control,current) returns
+        the state derivatives of a group of vehicles for the higher-order integrators.
+        u_actual and u_control are held constant over the integration step.
+        """
+        raise NotImplementedError(f"{type(self).__name__} supports only the 'euler' integrator")
+
+    def advance_batch(self, eta, nu, u_actual, u_control, time_span):
+        """
+        [eta,nu] = advance_batch(eta,nu,u_actual,u_control,time_span) moves a group of
+        vehicles along the exact solution of their motion over time_span with the
+        control inputs held, for the 'exact' integrator.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support the 'exact' integrator")
+
+    def actuators_batch(self, eta, nu, u_actual, u_control):
+        """
+        [nu,u_actual] = actuators_batch(eta,nu,u_actual,u_control) updates the states
+        that follow the control inputs algebraically after an integration step.
+        """
+        return nu, u_actual
+
+    def repositioning_batch(self, eta, nu, sample_time):
+        """
+        eta = repositioning_batch(eta,nu,sample_time) repositions a group of vehicles
+        stored row-wise in (n, 6) arrays.
+        """
+        for row in range(len(eta)):
+            eta[row] = self.repositioning(eta[row], nu[row], sample_time)
+        return eta
+
     def set_data_storage(self, data_storage):
         self.data_storage = data_storage